@@ -0,0 +1,128 @@
+import collections
+import hashlib
+import json
+import time
+
+import metrics
+from atomic_write import atomic_write
+
+
+ALIAS_CACHE_PATH = "cache_files/aliases.json"
+MAX_ALIASES = 100_000
+ALIAS_TTL_DAYS = 30
+
+def player_key(player):
+    """
+    Stable reference to a fantasy player: its api id, else its _id.$oid.
+    """
+    api_id = player.get("api_player_id") or player.get("player_api_id")
+    if api_id is not None:
+        return f"api:{api_id}"
+    pid = player.get("_id")
+    if isinstance(pid, dict):
+        pid = pid.get("$oid") or pid.get("oid")
+    return f"oid:{pid}" if pid else None
+
+def exported_key(exported):
+    """
+    player_key of the catalog player a mapped_players.json record was exported from.
+    """
+    return player_key({"player_api_id": exported.get("player_api_id"), "_id": exported.get("player_id")})
+
+def player_fingerprint(player):
+    return hashlib.sha1(json.dumps(dict(player), sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class AliasCache:
+    """
+    Persistent runnerName -> fantasy player(s) resolutions from earlier runs,
+    with the match type ("exact" / "fuzzy"), score and normalized name.
+    Entries are evicted least-recently-used beyond max_entries and once unused
+    for ttl_days. An entry is dropped when one of its players is no longer in
+    the catalog or its record changed, and the whole cache is dropped when the
+    normalization code changes (`version`). A fuzzy choice depends on every
+    other player in the catalog, so fuzzy entries are also dropped whenever
+    the catalog itself (`catalog`, e.g. a hash of its file) changes.
+    """
+
+    def __init__(self, file_path=ALIAS_CACHE_PATH, version=None, max_entries=MAX_ALIASES, ttl_days=ALIAS_TTL_DAYS,
+                 catalog=None):
+        self.file_path = file_path
+        self.version = version
+        self.catalog = catalog
+        self.max_entries = max_entries
+        self.ttl = ttl_days * 86400
+        self.entries = collections.OrderedDict()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict) or data.get("version") != self.version:
+            return
+        now = time.time()
+        same_catalog = data.get("catalog") == self.catalog
+        for name, entry in data.get("aliases", []):
+            if entry.get("match_type") == "fuzzy" and not same_catalog:
+                continue
+            if now - entry.get("last_seen", 0) <= self.ttl:
+                self.entries[name] = entry
+
+    def resolve(self, name, players_by_key, threshold=0, exact_index=None):
+        """
+        (players, entry) for a cached runner name, or None on a miss.
+        Fuzzy entries below threshold count as misses; stale entries are dropped.
+        With exact_index (exact_match_mapper.build_exact_index), an exact entry
+        also has to match what its normalized name resolves to now, so a new
+        player sharing the name invalidates it.
+        """
+        entry = self.entries.get(name)
+        if entry is None or (entry["match_type"] == "fuzzy" and entry["match_score"] < threshold):
+            if metrics.active:
+                metrics.active.count("alias_misses")
+            return None
+        if exact_index is not None and entry["match_type"] == "exact":
+            current = exact_index.get(entry["norm"])
+            if current is None or [player_key(p) for p in current[1]] != [key for key, _ in entry["players"]]:
+                return self._invalidate(name)
+        players = []
+        for key, fingerprint in entry["players"]:
+            player = players_by_key.get(key)
+            if player is None or player_fingerprint(player) != fingerprint:
+                return self._invalidate(name)
+            players.append(player)
+        entry["last_seen"] = time.time()
+        self.entries.move_to_end(name)
+        if metrics.active:
+            metrics.active.count("alias_hits")
+        return players, entry
+
+    def _invalidate(self, name):
+        del self.entries[name]
+        if metrics.active:
+            metrics.active.count("alias_invalidated")
+        return None
+
+    def record(self, name, norm, players, match_type, match_score):
+        refs = [(player_key(p), player_fingerprint(p)) for p in players]
+        if not refs or any(key is None for key, _ in refs):
+            return
+        self.entries[name] = {
+            "norm": norm,
+            "players": refs,
+            "match_type": match_type,
+            "match_score": match_score,
+            "last_seen": time.time(),
+        }
+        self.entries.move_to_end(name)
+
+    def save(self):
+        now = time.time()
+        for name in [n for n, e in self.entries.items() if now - e["last_seen"] > self.ttl]:
+            del self.entries[name]
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        atomic_write(self.file_path, json.dumps({"version": self.version, "catalog": self.catalog,
+                                                 "aliases": list(self.entries.items())}, ensure_ascii=False))
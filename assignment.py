@@ -0,0 +1,144 @@
+import metrics
+
+
+ASSIGNMENT_MODES = ("greedy", "optimal")
+# Components with more runners or players than this are assigned greedily in "optimal" mode.
+MAX_COMPONENT = 100
+
+def greedy_assign(edges):
+    """
+    One-to-one assignment over sparse (runner, player, score, rank) edges:
+    highest score first, then the runner's better-ranked candidate, then
+    runner order. Returns runner -> edge; every player is used at most once.
+    """
+    assigned = {}
+    taken = set()
+    for edge in sorted(edges, key=lambda e: (-e[2], e[3], e[0])):
+        runner, player = edge[0], edge[1]
+        if runner in assigned or player in taken:
+            continue
+        assigned[runner] = edge
+        taken.add(player)
+    return assigned
+
+def components(edges):
+    """
+    Edges grouped by connected component of the runner / player graph, in order of first edge.
+    """
+    parent = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for edge in edges:
+        a, b = find(("r", edge[0])), find(("p", edge[1]))
+        if a != b:
+            parent[b] = a
+    groups = {}
+    for edge in edges:
+        groups.setdefault(find(("r", edge[0])), []).append(edge)
+    return list(groups.values())
+
+def hungarian(cost):
+    """
+    Minimum-cost assignment of a square cost matrix (list of lists):
+    column of each row. O(n^3) shortest augmenting paths with potentials.
+    """
+    n = len(cost)
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (n + 1)
+    match = [0] * (n + 1)
+    way = [0] * (n + 1)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        minv = [inf] * (n + 1)
+        used = [False] * (n + 1)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            delta = inf
+            j1 = 0
+            for j in range(1, n + 1):
+                if not used[j]:
+                    cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(n + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+    rows = [0] * n
+    for j in range(1, n + 1):
+        if match[j]:
+            rows[match[j] - 1] = j - 1
+    return rows
+
+def optimal_assign(edges, max_component=MAX_COMPONENT):
+    """
+    Maximum total score one-to-one assignment: each connected component of the
+    sparse graph is solved exactly with the Hungarian algorithm, so no dense
+    runners x players matrix is ever built. Components larger than
+    max_component fall back to greedy_assign.
+    """
+    assigned = {}
+    for group in components(edges):
+        runners = sorted({e[0] for e in group})
+        players = sorted({e[1] for e in group})
+        if len(group) == 1 or len(runners) == 1 or len(players) == 1:
+            assigned.update(greedy_assign(group))
+            continue
+        if max(len(runners), len(players)) > max_component:
+            if metrics.active:
+                metrics.active.count("assignment_greedy_components")
+            assigned.update(greedy_assign(group))
+            continue
+        size = max(len(runners), len(players))
+        row_of = {r: i for i, r in enumerate(runners)}
+        col_of = {p: j for j, p in enumerate(players)}
+        best = {}
+        for e in group:
+            key = (row_of[e[0]], col_of[e[1]])
+            if key not in best or (-e[2], e[3]) < (-best[key][2], best[key][3]):
+                best[key] = e
+        cost = [[0.0] * size for _ in range(size)]
+        for (i, j), e in best.items():
+            cost[i][j] = -e[2]
+        for i, j in enumerate(hungarian(cost)):
+            edge = best.get((i, j))
+            if edge is not None:
+                assigned[edge[0]] = edge
+    return assigned
+
+def assign(edges, mode="greedy"):
+    return optimal_assign(edges) if mode == "optimal" else greedy_assign(edges)
+
+def contested(edges, assigned):
+    """
+    Players that were the first choice (rank 0) of more than one runner:
+    [(player, [claiming runner edges in runner order], winning runner or None)].
+    """
+    claims = {}
+    for e in edges:
+        if e[3] == 0:
+            claims.setdefault(e[1], []).append(e)
+    winners = {e[1]: runner for runner, e in assigned.items()}
+    return [(player, sorted(es, key=lambda e: e[0]), winners.get(player))
+            for player, es in claims.items() if len(es) > 1]
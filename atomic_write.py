@@ -0,0 +1,21 @@
+import os
+
+
+def atomic_write(path, payload, mode="w"):
+    """
+    Write payload (str, or bytes with a binary mode) to path through a
+    per-process temp file renamed over it, so readers never see a partial
+    file; the temp file is removed if anything fails.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
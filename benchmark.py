@@ -0,0 +1,331 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fetch_all_player_names as extraction
+import exact_match_mapper as exact
+import fuzzy_matcher as fuzzy
+from mapped_players_store import MappedPlayerStore
+from player_table import PlayerTable
+
+
+FIRST_NAMES = [
+    "Erling", "Heung-min", "Mohamed", "Mohammed", "Alexander", "Alex", "Bruno", "Gabriel",
+    "Kai", "Martin", "Søren", "Jørgen", "Çağlar", "Kerem", "Ilkay", "İlkay", "Dominik",
+    "Bernardo", "João", "José", "Raphaël", "Ángel", "Nicolás", "Łukasz", "Dušan",
+    "Scott", "James", "Reece", "Bukayo", "Declan", "Pierre-Emile", "Yerson", "Cole",
+]
+
+LAST_NAMES = [
+    "Haaland", "Håland", "Son", "Salah", "Silva", "James", "Fernandes", "Martinelli",
+    "Havertz", "Ødegaard", "Højbjerg", "Söyüncü", "Aktürkoğlu", "Gündoğan", "Szoboszlai",
+    "Félix", "Müller", "Núñez", "Fabiański", "Vlahović", "Carson", "Saka", "Rice",
+    "Mosquera", "Palmer", "Doğan", "Yıldız", "Kerkez", "Mitoma", "Mbeumo", "Wissa",
+]
+
+NICKNAMES = {
+    "Mohamed": "Mohammed",
+    "Mohammed": "Mohamed",
+    "Alexander": "Alex",
+    "Alex": "Alexander",
+    "Heung-min": "Heungmin",
+    "Håland": "Haaland",
+    "Haaland": "Håland",
+}
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+SQUAD_SIZE = 25
+
+def strip_for_feed(name):
+    return extraction.normalize_name_for_display(name)
+
+def synthetic_catalog(n_players, seed=0):
+    """
+    Seeded fantasy catalog shaped like Fantasy_LiveScoring.players.json, with
+    accented and TRANSLIT_MAP characters and repeated common surnames.
+    """
+    rnd = random.Random(seed)
+    n_teams = max(n_players // SQUAD_SIZE, 2)
+    players = []
+    for i in range(n_players):
+        first = rnd.choice(FIRST_NAMES)
+        last = rnd.choice(LAST_NAMES)
+        if rnd.random() < 0.5:
+            last = f"{last}{rnd.choice(LAST_NAMES).lower()}"
+        full = f"{first} {last}"
+        players.append({
+            "_id": {"$oid": f"{rnd.getrandbits(96):024x}"},
+            "api_player_id": 100_000 + i,
+            "common_name": f"{first[0]}. {last}",
+            "display_name": full if rnd.random() < 0.9 else None,
+            "first_name": first,
+            "last_name": last,
+            "name": full,
+            "date_of_birth": "1995-01-01",
+            "height": rnd.randint(165, 200),
+            "weight": rnd.randint(60, 95),
+            "gender": "male",
+            "position": "Midfielder",
+            "position_group": "MF",
+            "team_name": f"Team {i % n_teams}",
+            "image": None,
+            "image_url": None,
+            "price": None,
+        })
+    return players
+
+def runner_name(rnd, player):
+    """
+    One betting-feed spelling of a catalog player: exact, accent-folded,
+    nickname, initial form, surname only or typo.
+    """
+    first, last = player["first_name"], player["last_name"]
+    r = rnd.random()
+    if r < 0.4:
+        return player["display_name"] or player["name"]
+    if r < 0.55:
+        return strip_for_feed(player["name"])
+    if r < 0.65:
+        return f"{NICKNAMES.get(first, first)} {NICKNAMES.get(last, last)}"
+    if r < 0.75:
+        return player["common_name"]
+    if r < 0.85:
+        return strip_for_feed(last)
+    name = list(strip_for_feed(player["name"]))
+    i = rnd.randrange(len(name))
+    name[i] = rnd.choice("aeiou")
+    return "".join(name)
+
+def synthetic_feed(players, n_runners, seed=0, unknown_rate=0.05, runners_per_event=40):
+    """
+    Seeded EPL feed shaped like input_files/epl_data.json: fixtures between two
+    catalog teams whose runners come from those two squads.
+    """
+    rnd = random.Random(seed + 1)
+    squads = {}
+    for p in players:
+        squads.setdefault(p["team_name"], []).append(p)
+    teams = sorted(squads)
+    events = []
+    for start in range(0, n_runners, runners_per_event):
+        home, away = rnd.sample(teams, 2)
+        squad = squads[home] + squads[away]
+        names = []
+        for _ in range(min(runners_per_event, n_runners - start)):
+            if rnd.random() < unknown_rate:
+                names.append(f"{rnd.choice(['John', 'Xavi', 'Tom'])} {rnd.choice(['Doe', 'Random', 'Nobody'])}{rnd.randint(0, 99)}")
+            else:
+                names.append(runner_name(rnd, rnd.choice(squad)))
+        events.append({
+            "name": f"{home} v {away}",
+            "futures": [
+                {"marketType": extraction.MARKET_TYPE,
+                 "runners": [{"runnerName": n} for n in names]},
+                {"marketType": "MATCH_ODDS", "runners": [{"runnerName": "Home"}, {"runnerName": "Away"}]},
+            ],
+        })
+    return [{"events": events}]
+
+def measure(fn, trace_memory):
+    """
+    Run fn() once for wall time; when trace_memory, run it again under tracemalloc for peak memory.
+    Returns (result, seconds, peak_mb or None).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        peak_mb = None
+        if trace_memory:
+            tracemalloc.start()
+            fn()
+            peak_mb = round(tracemalloc.get_traced_memory()[1] / 2**20, 3)
+            tracemalloc.stop()
+    return result, seconds, peak_mb
+
+def stage_report(seconds, items, peak_mb):
+    return {
+        "seconds": round(seconds, 6),
+        "items": items,
+        "items_per_sec": round(items / seconds, 1) if seconds > 0 else None,
+        "peak_mb": peak_mb,
+    }
+
+BLOCK_SOURCES = ("token", "key", "ngram", "full_pool")
+
+def candidate_stats(epl_list, index):
+    """
+    Candidate block sizes, and the share of queries served by each postings
+    source; full_pool is the fallback that scores the whole pool.
+    """
+    sizes = []
+    sources = dict.fromkeys(BLOCK_SOURCES, 0)
+    for e in epl_list:
+        positions, source = index.lookup(fuzzy.NameFeatures(e))
+        sizes.append(len(positions))
+        sources[source] += 1
+    sizes.sort()
+    if not sizes:
+        return {"mean": 0, "p95": 0, "max": 0, "sources": sources, "fallback_rate": 0}
+    return {
+        "mean": round(sum(sizes) / len(sizes), 2),
+        "p95": sizes[min(len(sizes) - 1, int(len(sizes) * 0.95))],
+        "max": sizes[-1],
+        "sources": sources,
+        "fallback_rate": round(sources["full_pool"] / len(sizes), 4),
+    }
+
+def resident_bytes(build):
+    """
+    Bytes still allocated once build() returns, while its result is alive.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+def memory_per_player(catalog_path):
+    """
+    Resident bytes per player of the catalog held as projected dicts and as a PlayerTable.
+    """
+    dict_bytes, players = resident_bytes(lambda: list(extraction.stream_fantasy_players(catalog_path)))
+    table_bytes, _ = resident_bytes(lambda: PlayerTable.from_players(extraction.stream_fantasy_players(catalog_path)))
+    n = max(len(players), 1)
+    return {"dicts": round(dict_bytes / n, 1), "table": round(table_bytes / n, 1)}
+
+def write_lines(names, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for n in names:
+            f.write(n + "\n")
+
+def bench_size(n_players, n_runners, seed, threshold, trace_memory):
+    """
+    Time every pipeline stage on one synthetic catalog/feed pair, inside a
+    scratch directory so no real output file is touched.
+    """
+    players = synthetic_catalog(n_players, seed)
+    feed = synthetic_feed(players, n_runners, seed)
+    stages = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="player_mapper_bench_") as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs("input_files")
+            catalog_path = "input_files/Fantasy_LiveScoring.players.json"
+            feed_path = "input_files/epl_data.json"
+            with open(catalog_path, "w", encoding="utf-8") as f:
+                json.dump(players, f, ensure_ascii=False)
+            with open(feed_path, "w", encoding="utf-8") as f:
+                json.dump(feed, f, ensure_ascii=False)
+
+            runners, seconds, peak = measure(lambda: extraction.stream_epl_runners(feed_path), trace_memory)
+            stages["stream_epl_runners"] = stage_report(seconds, len(runners), peak)
+            epl_names = [r["runner"] for r in runners]
+            runner_events_csv = "intermediary_files/epl_runner_events.csv"
+            extraction.export_runner_events(runners, runner_events_csv)
+
+            projected, seconds, peak = measure(lambda: list(extraction.stream_fantasy_players(catalog_path)), trace_memory)
+            stages["stream_fantasy_players"] = stage_report(seconds, len(projected), peak)
+            memory = memory_per_player(catalog_path)
+
+            def run_exact():
+                return exact.map_exact(epl_names, projected, store=MappedPlayerStore("output_files/bench.json", dry_run=True))
+            (not_found, remaining), seconds, peak = measure(run_exact, trace_memory)
+            stages["map_exact"] = stage_report(seconds, len(epl_names), peak)
+
+            epl_list = [n.strip() for n in not_found if n and n.strip()]
+            pool = [n for n in remaining if n]
+            index = fuzzy.CandidateIndex(pool)
+            _, seconds, peak = measure(lambda: fuzzy.map_players(epl_list, pool, threshold=threshold, index=index), trace_memory)
+            stages["map_players"] = stage_report(seconds, len(epl_list), peak)
+            if fuzzy.has_batch_scoring:
+                _, seconds, peak = measure(lambda: fuzzy.map_players(epl_list, pool, threshold=threshold, index=index,
+                                                                     batch=True), trace_memory)
+                stages["map_players_batch"] = stage_report(seconds, len(epl_list), peak)
+
+            write_lines(epl_list, "leftovers.csv")
+            write_lines(pool, "pool.csv")
+
+            def run_stage3():
+                return fuzzy.run_stage3("leftovers.csv", "pool.csv", catalog_path, threshold=threshold, dry_run=True,
+                                        runner_events_csv=runner_events_csv)
+            _, seconds, peak = measure(run_stage3, trace_memory)
+            stages["run_stage3"] = stage_report(seconds, len(epl_list), peak)
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "players": n_players,
+        "runners": len(epl_names),
+        "exact_matched": len(epl_names) - len(not_found),
+        "fuzzy_leftovers": len(epl_list),
+        "candidates_per_query": candidate_stats(epl_list, index),
+        "bytes_per_player": memory,
+        "stages": stages,
+    }
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def parse_sizes(x):
+    try:
+        return [int(v) for v in x.split(",") if v]
+    except ValueError:
+        raise argparse.ArgumentTypeError("sizes must be a comma separated list of integers")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic-scale benchmark of the three pipeline stages.")
+    parser.add_argument("--sizes", type=parse_sizes, default=list(SIZES[:2]),
+                        help=f"Comma separated catalog sizes. Defaults to {SIZES[0]},{SIZES[1]}; "
+                             f"{','.join(str(s) for s in SIZES)} is the full scale.")
+    parser.add_argument("--runners", type=int, default=None,
+                        help="EPL runners per feed. Defaults to 10%% of the catalog, capped at 5000.")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed. Defaults to 0.")
+    parser.add_argument("--threshold", "-t", type=fuzzy.parse_threshold, default=70,
+                        help="Fuzzy acceptance threshold used by run_stage3. Defaults to 70.")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the tracemalloc pass (halves the run time).")
+    parser.add_argument("--output", "-o", default="bench_results.json",
+                        help="Where to write the JSON report. Defaults to bench_results.json.")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        n_runners = args.runners or min(max(n // 10, 1), 5000)
+        print(f"Benchmarking {n} players / {n_runners} runners...")
+        result = bench_size(n, n_runners, args.seed, args.threshold, not args.no_memory)
+        for name, stage in result["stages"].items():
+            print(f"  {name:24s} {stage['seconds']:10.4f}s  {stage['items_per_sec'] or 0:12.1f}/s  peak={stage['peak_mb']} MB")
+        print(f"  candidates per query: {result['candidates_per_query']}")
+        print(f"  bytes per player: {result['bytes_per_player']}")
+        results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "rapidfuzz": fuzzy.has_rapidfuzz,
+        "seed": args.seed,
+        "threshold": args.threshold,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Wrote {args.output}")
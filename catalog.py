@@ -0,0 +1,200 @@
+import hashlib
+import inspect
+import json
+import marshal
+import os
+import sys
+
+import alias_cache
+import fetch_all_player_names as extraction
+import exact_match_mapper as exact
+import fuzzy_matcher as fuzzy
+import json_stream
+import normalization
+import player_table
+from atomic_write import atomic_write
+
+
+CACHE_DIR = "cache_files"
+CACHE_FORMAT_VERSION = 2
+
+def project_player(raw_player):
+    return {k: raw_player[k] for k in extraction.FANTASY_PLAYER_FIELDS if k in raw_player}
+
+def normalization_version():
+    """
+    Fingerprint of every piece of code that shapes the compiled catalog, so the
+    cache invalidates itself when the JSON reader, the projection, normalize /
+    TRANSLIT_MAP or the indexes change.
+    """
+    parts = [
+        str(CACHE_FORMAT_VERSION),
+        sys.version,
+        repr(extraction.FANTASY_PLAYER_FIELDS),
+        repr(sorted(extraction.TRANSLIT_MAP.items())),
+    ]
+    for obj in (
+        json_stream,
+        extraction.stream_fantasy_players,
+        project_player,
+        normalization,
+        player_table,
+        extraction.strip_accents,
+        extraction.normalize_name_for_display,
+        exact.strip_accents,
+        exact.normalize_name,
+        exact.exact_key_values,
+        exact.build_exact_index,
+        alias_cache.player_key,
+        fuzzy.normalize,
+        fuzzy.NameFeatures,
+        fuzzy.char_ngrams,
+        fuzzy.soundex,
+        fuzzy.blocking_keys,
+        fuzzy.CandidateIndex.__init__,
+        fuzzy.build_normalized_maps,
+        fuzzy.catalog_display_names,
+    ):
+        parts.append(inspect.getsource(obj))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class CompiledCatalog:
+    """
+    Fantasy catalog with everything the matchers derive from it: projected
+    players, the exact-match index, the stage 3 normalized maps and a
+    CandidateIndex over the display names. Indexes refer to players by row.
+    """
+
+    def __init__(self, players, exact_rows, display_norms, display_rows, name_rows, index_parts):
+        self.players = players
+        self._exact_rows = exact_rows
+        self._display_norms = display_norms
+        self._display_rows = display_rows
+        self._name_rows = name_rows
+        self._index_parts = index_parts
+        self._catalog_index = None
+
+    @classmethod
+    def compile(cls, raw_players):
+        players = player_table.PlayerTable.from_players(project_player(p) for p in raw_players)
+
+        exact_index, display_norms = exact.build_exact_index(players)
+        exact_rows = {k: (prio, [p.row for p in ps]) for k, (prio, ps) in exact_index.items()}
+
+        by_display, by_name = fuzzy.build_normalized_maps(players)
+        display_rows = {k: [p.row for p in ps] for k, ps in by_display.items()}
+        name_rows = {k: [p.row for p in ps] for k, ps in by_name.items()}
+
+        index = fuzzy.CandidateIndex(fuzzy.catalog_display_names(players))
+        index_parts = {
+            "features": [(f.norm, tuple(f.token_set), f.surname, f.initials) for f in index.features],
+            "by_token": index.by_token,
+            "by_surname": index.by_surname,
+            "by_gram": index.by_gram,
+            "gram_counts": index.gram_counts,
+            "by_key": index.by_key,
+        }
+        return cls(players, exact_rows, sorted(display_norms), display_rows, name_rows, index_parts)
+
+    def to_dict(self):
+        return {
+            "players": self.players.to_dict(),
+            "exact_rows": self._exact_rows,
+            "display_norms": self._display_norms,
+            "display_rows": self._display_rows,
+            "name_rows": self._name_rows,
+            "index_parts": self._index_parts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(player_table.PlayerTable.from_dict(data["players"]), data["exact_rows"], data["display_norms"],
+                   data["display_rows"], data["name_rows"], data["index_parts"])
+
+    def _players_of(self, rows):
+        return [self.players[i] for i in rows]
+
+    def exact_index(self):
+        """
+        Same shape as exact_match_mapper.build_exact_index(players).
+        """
+        index = {k: (prio, self._players_of(rows)) for k, (prio, rows) in self._exact_rows.items()}
+        return index, set(self._display_norms)
+
+    def normalized_maps(self):
+        """
+        Same shape as fuzzy_matcher.build_normalized_maps(players).
+        """
+        by_display = {k: self._players_of(rows) for k, rows in self._display_rows.items()}
+        by_name = {k: self._players_of(rows) for k, rows in self._name_rows.items()}
+        return by_display, by_name
+
+    def catalog_index(self):
+        if self._catalog_index is None:
+            names = fuzzy.catalog_display_names(self.players)
+            parts = self._index_parts
+            features = [fuzzy.NameFeatures.from_parts(n, *f) for n, f in zip(names, parts["features"])]
+            self._catalog_index = fuzzy.CandidateIndex.from_postings(
+                names, features, parts["by_token"], parts["by_surname"], parts["by_gram"], parts["gram_counts"],
+                parts["by_key"]
+            )
+        return self._catalog_index
+
+def cache_paths(fantasy_input, cache_dir=CACHE_DIR):
+    base = os.path.join(cache_dir, os.path.basename(fantasy_input))
+    return base + ".catalog", base + ".manifest.json"
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def load_compiled_catalog(fantasy_input, cache_dir=CACHE_DIR, use_cache=True):
+    """
+    Load the compiled catalog for fantasy_input.
+    A warm cache (same mtime and size, or same content hash, and same
+    normalization_version) is read and unmarshalled, skipping JSON
+    parsing and normalization. Otherwise the catalog is compiled from the
+    JSON and the cache rewritten.
+    """
+    if not use_cache:
+        return CompiledCatalog.compile(extraction.stream_fantasy_players(fantasy_input))
+
+    cache_path, manifest_path = cache_paths(fantasy_input, cache_dir)
+    stat = os.stat(fantasy_input)
+    version = normalization_version()
+    manifest = _read_manifest(manifest_path)
+
+    if manifest and manifest.get("normalization_version") == version and os.path.exists(cache_path):
+        fresh = manifest.get("mtime_ns") == stat.st_mtime_ns and manifest.get("size") == stat.st_size
+        if not fresh and manifest.get("sha256") == file_sha256(fantasy_input):
+            manifest.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            atomic_write(manifest_path, json.dumps(manifest, indent=4), "w")
+            fresh = True
+        if fresh:
+            try:
+                # marshal.loads copies its input whole, so a plain read costs no more than a mapping.
+                with open(cache_path, "rb") as f:
+                    return CompiledCatalog.from_dict(marshal.loads(f.read()))
+            except (ValueError, EOFError, TypeError, KeyError):
+                pass
+
+    compiled = CompiledCatalog.compile(extraction.stream_fantasy_players(fantasy_input))
+    atomic_write(cache_path, marshal.dumps(compiled.to_dict()), "wb")
+    atomic_write(manifest_path, json.dumps({
+        "source": fantasy_input,
+        "sha256": file_sha256(fantasy_input),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "normalization_version": version,
+    }, indent=4), "w")
+    return compiled
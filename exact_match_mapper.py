@@ -1,8 +1,13 @@
-import json
 import os
-import unicodedata
 import datetime
 
+from fetch_all_player_names import stream_fantasy_players
+from alias_cache import player_key
+from mapped_players_store import MAPPED_PLAYERS_PATH, MappedPlayerStore
+import metrics
+import normalization
+from player_table import PlayerTable
+
 
 def load_csv(file_path):
     names = []
@@ -11,38 +16,23 @@ def load_csv(file_path):
             names.append(line.strip())
     return names
 
-def load_json(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-TRANSLIT_MAP = {
-    "ı": "i",  # dotless i
-    "İ": "I",  # capital dotted i
-    "ğ": "g",
-    "Ğ": "G",
-    "Ø": "O",
-    "ø": "o",
-}
+def write_lines(names, file_path):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        for name in names:
+            f.write(name + "\n")
 
 def strip_accents(text):
-    if text is None:
-        return text
-    return "".join(
-        c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
-    )
+    return normalization.normalize(text, "accents")
 
 def normalize_name(text):
-    if text is None:
-        return ""
-    text = strip_accents(text)
-    # Apply transliteration map and lower-case for robust matching:
-    return "".join(TRANSLIT_MAP.get(c, c) for c in text).lower().strip()
+    if metrics.active:
+        metrics.active.count("normalize_name_calls")
+    # Accents stripped, transliteration map applied, lower-cased for robust matching.
+    return normalization.normalize(text, "exact")
 
 def transliterate(text):
-    if text is None:
-        return None
-    s = strip_accents(text)
-    return "".join(TRANSLIT_MAP.get(c, c) for c in s)
+    return normalization.normalize(text, "display")
 
 def prepare_export_player(raw_player):
     # Build reduced object
@@ -64,142 +54,137 @@ def prepare_export_player(raw_player):
         "created_at": {"$date": created_iso}
     }
 
-def export_individual_player(raw_player):
+def export_individual_player(raw_player, file_path=MAPPED_PLAYERS_PATH, store=None):
     """
-    Transform raw fantasy player into reduced dict and append to output_files/mapped_players.json.
+    Transform raw fantasy player into reduced dict and add it to output_files/mapped_players.json.
     Duplicate detection by player_api_id (preferred), else _id.$oid, else exact object.
+    When a MappedPlayerStore is passed the write is deferred to store.flush().
     """
     exported = prepare_export_player(raw_player)
-    file_path = "output_files/mapped_players.json"
-    players = []
-
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            try:
-                players = json.load(f)
-                if not isinstance(players, list):
-                    players = [players]
-            except json.JSONDecodeError:
-                players = []
-
-    api_id = exported.get("player_api_id")
-    db_oid = None
-    pid = exported.get("player_id")
-    if isinstance(pid, dict):
-        db_oid = pid.get("$oid") or pid.get("oid") or None
-
-    duplicate = False
-    if api_id is not None:
-        duplicate = any(isinstance(p, dict) and p.get("player_api_id") == api_id for p in players)
-    elif db_oid:
-        duplicate = any(isinstance(p, dict)
-                        and isinstance(p.get("player_id"), dict)
-                        and p.get("player_id").get("$oid") == db_oid
-                        for p in players)
-    else:
-        duplicate = exported in players
-
-    if duplicate:
-        return False
-
-    players.append(exported)
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(players, f, indent=4, ensure_ascii=False)
-    return True
+    if store is not None:
+        return store.add(exported)
+    store = MappedPlayerStore(file_path)
+    added = store.add(exported)
+    store.flush()
+    return added
 
-def build_normalized_map(full_fantasy_data, mapping_field):
-    norm_map = {}
-    for player in full_fantasy_data:
-        val = player.get(mapping_field)
-        if not val:
-            continue
-        norm = normalize_name(val)
-        norm_map.setdefault(norm, []).append(player)
-    return norm_map
+EXACT_KEY_PRIORITY = ("display_name", "name", "common_name", "first_name + last_name")
 
-def map_names(
-        fantasy_players_csv,
+def exact_key_values(player):
+    """
+    Raw values of the exact-match keys of a player, in EXACT_KEY_PRIORITY order.
+    """
+    first = player.get("first_name")
+    last = player.get("last_name")
+    return (
+        player.get("display_name"),
+        player.get("name"),
+        player.get("common_name"),
+        f"{first} {last}" if first and last else None,
+    )
+
+def build_exact_index(full_fantasy_data):
+    """
+    Single pass over the catalog building one hash index over every exact-match key.
+    Returns (index, display_norms): index maps a normalized key to
+    (priority, [players]) keeping only the players of the best-priority field
+    for that key; display_norms is the set of normalized display names
+    (display_name, else name) that seeds the fuzzy pool.
+    Keys whose players are not all the same player (by player_key) are left
+    out, so an ambiguous name such as "J. Wright" resolves nobody.
+    """
+    index = {}
+    display_norms = set()
+    for player in full_fantasy_data:
+        values = exact_key_values(player)
+        for priority, val in enumerate(values):
+            if not val:
+                continue
+            norm = normalize_name(val)
+            entry = index.get(norm)
+            if entry is None or priority < entry[0]:
+                index[norm] = (priority, [player])
+            elif priority == entry[0]:
+                entry[1].append(player)
+        chosen = values[0] or values[1]
+        if chosen:
+            display_norms.add(normalize_name(chosen))
+    for norm in [k for k, (_, players) in index.items() if len({player_key(p) for p in players}) > 1]:
+        del index[norm]
+    return index, display_norms
+
+def map_exact(
         epl_players,
         full_fantasy_data,
-        mapping_field,
-        file_name_not_found,
-        output_file_name_remaining
+        file_name_not_found=None,
+        output_file_name_remaining=None,
+        store=None,
+        index=None,
+        resolved=None
     ):
-    fantasy_norm_list = [normalize_name(x) for x in fantasy_players_csv]
-    fantasy_norm_set = set(fantasy_norm_list)
-
-    normalized_map = build_normalized_map(full_fantasy_data, mapping_field)
-
-    numbers_of_common_players = 0     
-    numbers_of_players_not_found = 0
+    """
+    Exact-match every EPL name with one lookup in the build_exact_index index,
+    in place of separate display_name and name passes. Names the index leaves
+    unresolved, ambiguous ones included, stay in the fuzzy pool.
+    Returns (not_found_players, sorted remaining normalized fantasy display names);
+    each list is also written to its CSV path when one is given.
+    When a dict is passed as resolved, every matched name is recorded in it as
+    name -> (normalized name, matched players).
+    """
+    own_store = store is None
+    if own_store:
+        store = MappedPlayerStore()
+    if index is None:
+        index = build_exact_index(full_fantasy_data)
+    exact_index, display_norms = index
+
+    numbers_of_common_players = 0
     not_found_players = []
-
-    remaining_fantasy_norm = set(fantasy_norm_list)
+    remaining_fantasy_norm = set(display_norms)
 
     for epl_player in epl_players:
         norm_epl = normalize_name(epl_player)
-
-        if norm_epl in fantasy_norm_set:
-            if norm_epl in normalized_map:
-                matched_players = normalized_map[norm_epl]
-                exported_any = False
-                for mp in matched_players:
-                    exported = export_individual_player(mp)
-                    if exported:
-                        numbers_of_common_players += 1
-                        exported_any = True
-                remaining_fantasy_norm.discard(norm_epl)
-                if not exported_any:
-                    pass
-            else:
-                numbers_of_players_not_found += 1
-                not_found_players.append(epl_player)
-                remaining_fantasy_norm.discard(norm_epl)
-        else:
-            numbers_of_players_not_found += 1
+        entry = exact_index.get(norm_epl)
+        if entry is None:
             not_found_players.append(epl_player)
+            continue
+        remaining_fantasy_norm.discard(norm_epl)
+        for mp in entry[1]:
+            if export_individual_player(mp, store=store):
+                numbers_of_common_players += 1
+        if resolved is not None:
+            resolved[epl_player] = (norm_epl, entry[1])
 
-    print(f"Number of common players (exported records): {numbers_of_common_players}")
-    print(f"Number of players not found: {numbers_of_players_not_found}")
+    if own_store:
+        store.flush()
 
-    os.makedirs(os.path.dirname(file_name_not_found), exist_ok=True)
-    with open(file_name_not_found, "w", encoding="utf-8") as f:
-        for name in not_found_players:
-            f.write(name + "\n")
+    print(f"Number of common players (exported records): {numbers_of_common_players}")
+    print(f"Number of players not found: {len(not_found_players)}")
 
-    os.makedirs(os.path.dirname(output_file_name_remaining), exist_ok=True)
-    with open(output_file_name_remaining, "w", encoding="utf-8") as f:
-        for name in sorted(remaining_fantasy_norm):
-            f.write(name + "\n")
+    remaining = sorted(remaining_fantasy_norm)
+    if file_name_not_found:
+        write_lines(not_found_players, file_name_not_found)
+    if output_file_name_remaining:
+        write_lines(remaining, output_file_name_remaining)
+    return not_found_players, remaining
 
 if "__main__" == __name__:
-    fantasy_players_display_names = load_csv("intermediary_files/fantasy_player_display_names.csv")
     epl_players = load_csv("intermediary_files/epl_player_names.csv")
-    fantasy_full_data = load_json("input_files/Fantasy_LiveScoring.players.json")
+    fantasy_full_data = PlayerTable.from_players(stream_fantasy_players("input_files/Fantasy_LiveScoring.players.json"))
 
     try:
-        os.remove("output_files/mapped_players.json")
+        os.remove(MAPPED_PLAYERS_PATH)
     except FileNotFoundError:
         pass
 
-    map_names(
-        fantasy_players_display_names,
-        epl_players,
-        fantasy_full_data,
-        mapping_field="display_name",
-        file_name_not_found="intermediary_files/epl_players_remained_after_first_iter.csv",
-        output_file_name_remaining="intermediary_files/remaining_fantasy_display_names.csv"
-    )
-
-    fantasy_player_names = load_csv("intermediary_files/fantasy_player_names.csv")
-    not_matched_display_names = load_csv("intermediary_files/epl_players_remained_after_first_iter.csv")
+    store = MappedPlayerStore(MAPPED_PLAYERS_PATH)
 
-    map_names(
-        fantasy_player_names, 
-        not_matched_display_names, 
+    map_exact(
+        epl_players,
         fantasy_full_data,
-        mapping_field="name",
         file_name_not_found="intermediary_files/epl_players_remained_after_second_iter.csv",
-        output_file_name_remaining="intermediary_files/remaining_fantasy_names.csv"
+        output_file_name_remaining="intermediary_files/remaining_fantasy_display_names.csv",
+        store=store
     )
+
+    store.flush()
@@ -1,12 +1,39 @@
+import csv
 import json
-import unicodedata
 import os
-
+import re
+
+from json_stream import iter_json_items
+import metrics
+import normalization
+from normalization import TRANSLIT_MAP
+
+
+# Only the fantasy fields read by prepare_export_player and the matchers.
+FANTASY_PLAYER_FIELDS = (
+    "_id",
+    "id",
+    "api_player_id",
+    "player_api_id",
+    "display_name",
+    "name",
+    "common_name",
+    "first_name",
+    "last_name",
+    "team_name",
+    "team",
+)
 
 def load_json(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def stream_fantasy_players(file_path, fields=FANTASY_PLAYER_FIELDS):
+    """
+    Yield fantasy players one at a time, reduced to `fields`, without loading the whole file.
+    """
+    return iter_json_items(file_path, ("*",), fields=fields)
+
 def export_csv(names, out_path):
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     with open(out_path, "w", encoding="utf-8") as f:
@@ -16,20 +43,7 @@ def export_csv(names, out_path):
             f.write(name + "\n")
 
 def strip_accents(text):
-    if text is None:
-        return text
-    return "".join(
-        c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
-    )
-
-TRANSLIT_MAP = {
-    "ı": "i",  # dotless i
-    "İ": "I",  # capital dotted i
-    "ğ": "g",
-    "Ğ": "G",
-    "Ø": "O",
-    "ø": "o",
-}
+    return normalization.normalize(text, "accents")
 
 def normalize_name_for_display(text):
     """
@@ -37,10 +51,19 @@ def normalize_name_for_display(text):
     strip accents then apply transliteration map.
     (No lowercasing here to preserve original behavior.)
     """
-    if text is None:
-        return None
-    text = strip_accents(text)
-    return "".join(TRANSLIT_MAP.get(c, c) for c in text)
+    if metrics.active:
+        metrics.active.count("normalize_name_for_display_calls")
+    return normalization.normalize(text, "display")
+
+MARKET_TYPE = "PLAYER_TO_HAVE_1_OR_MORE_SHOTS"
+
+def event_runner_names(event, market_types=(MARKET_TYPE,)):
+    names = []
+    for future in event.get("futures", []) :
+        if future.get("marketType") in market_types:
+            for runner in future.get("runners", []):
+                names.append(runner.get("runnerName"))
+    return names
 
 def get_epl_player_names(epl_json_data):
     """
@@ -53,12 +76,75 @@ def get_epl_player_names(epl_json_data):
 
     first = epl_json_data[0]
     for event in first.get("events", []):
-        for future in event.get("futures", []) :
-            if future.get("marketType") == "PLAYER_TO_HAVE_1_OR_MORE_SHOTS":
-                for runner in future.get("runners", []):
-                    names.append(runner.get("runnerName"))
+        names.extend(event_runner_names(event))
     return names
 
+def stream_epl_player_names(file_path):
+    """
+    Streaming get_epl_player_names: reads json_data[0]["events"] one event at a time.
+    """
+    return [r["runner"] for r in stream_epl_runners(file_path)]
+
+_FIXTURE_SEPARATOR = re.compile(r"\s+(?:v|vs\.?|@)\s+", re.IGNORECASE)
+
+def event_teams(event_name):
+    """
+    The two teams of a fixture name such as "Arsenal v Chelsea", or () when it doesn't look like one.
+    """
+    parts = _FIXTURE_SEPARATOR.split(event_name or "")
+    if len(parts) != 2 or not all(p.strip() for p in parts):
+        return ()
+    return tuple(p.strip() for p in parts)
+
+def stream_epl_runners(file_path, market_types=(MARKET_TYPE,), all_sections=False):
+    """
+    stream_epl_player_names with the event context kept next to every runner:
+    [{"runner": runnerName, "event": event name, "teams": (home, away)}, ...]
+    all_sections reads the events of every top-level item instead of json_data[0] only.
+    """
+    runners = []
+    for event in iter_json_items(file_path, ("*" if all_sections else 0, "events", "*")):
+        if isinstance(event, dict):
+            event_name = event.get("name")
+            teams = event_teams(event_name)
+            for name in event_runner_names(event, market_types):
+                runners.append({"runner": name, "event": event_name, "teams": teams})
+    return runners
+
+def export_runner_events(runners, out_path):
+    """
+    runner,event CSV next to epl_player_names.csv, read back by stage 3 for event blocking.
+    """
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["runner", "event"])
+        for r in runners:
+            if r["runner"] is not None:
+                writer.writerow([r["runner"], r["event"] or ""])
+
+def runner_teams(runners):
+    """
+    stripped runner name -> teams of every fixture it was offered in.
+    """
+    teams = {}
+    for r in runners:
+        if r["runner"] is None:
+            continue
+        known = teams.setdefault(r["runner"].strip(), [])
+        known.extend(t for t in r["teams"] if t not in known)
+    return teams
+
+def load_runner_teams(file_path):
+    """
+    runner_teams from an export_runner_events CSV.
+    """
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        return runner_teams([
+            {"runner": row.get("runner"), "teams": event_teams(row.get("event"))}
+            for row in csv.DictReader(f)
+        ])
+
 def get_fantasy_player_display_names(full_fantasy_json):
     """
     Mirrors fetch_fantasy_player_display_names.py:
@@ -92,19 +178,20 @@ if __name__ == "__main__":
     fantasy_input = "input_files/Fantasy_LiveScoring.players.json"
 
     epl_out = "intermediary_files/epl_player_names.csv"
+    runner_events_out = "intermediary_files/epl_runner_events.csv"
     fantasy_display_out = "intermediary_files/fantasy_player_display_names.csv"
     fantasy_name_out = "intermediary_files/fantasy_player_names.csv"
 
     print("Loading JSON inputs...")
-    epl_json = load_json(epl_input)
-    fantasy_json = load_json(fantasy_input)
-
-    epl_names = get_epl_player_names(epl_json)
+    epl_runners = stream_epl_runners(epl_input)
+    epl_names = [r["runner"] for r in epl_runners]
+    fantasy_json = list(stream_fantasy_players(fantasy_input))
 
     fantasy_display_names = get_fantasy_player_display_names(fantasy_json)
 
     fantasy_names = get_fantasy_player_names(fantasy_json)
 
     export_csv(epl_names, epl_out)
+    export_runner_events(epl_runners, runner_events_out)
     export_csv(fantasy_display_names, fantasy_display_out)
     export_csv(fantasy_names, fantasy_name_out)
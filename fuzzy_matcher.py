@@ -1,10 +1,23 @@
 import os
 import json
-import unicodedata
-import re
 import argparse
+import copy
+import csv
+import heapq
 from difflib import SequenceMatcher
 import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from alias_cache import player_key
+import assignment as assigner
+from assignment import ASSIGNMENT_MODES
+from fetch_all_player_names import load_runner_teams, stream_fantasy_players
+from mapped_players_store import MAPPED_PLAYERS_NDJSON_PATH, MAPPED_PLAYERS_PATH, MappedPlayerStore
+from ndjson_writer import NDJSONWriter
+import metrics
+import normalization
+from player_table import PlayerTable
 
 
 try:
@@ -17,6 +30,14 @@ except Exception:
         return int(SequenceMatcher(None, a, b).ratio() * 100)
     has_rapidfuzz = False
 
+try:
+    import numpy as np
+    from rapidfuzz import process
+    has_batch_scoring = True
+except Exception:
+    np = None
+    has_batch_scoring = False
+
 def load_csv(file_path):
     names = []
     with open(file_path, "r", encoding="utf-8") as f:
@@ -36,14 +57,9 @@ def write_json(path, data):
         json.dump(data, f, indent=4, ensure_ascii=False)
 
 def normalize(name):
-    s = (name or "").lower().strip()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(c for c in s if not unicodedata.combining(c))
-    s = s.replace('-', ' ').replace('–', ' ').replace("’", "'")
-    s = re.sub(r"[^a-z0-9'\s]", ' ', s)
-    s = re.sub(r"\b(jr|junior)\b", '', s)
-    s = re.sub(r"\s+", ' ', s).strip()
-    return s
+    if metrics.active:
+        metrics.active.count("normalize_calls")
+    return normalization.normalize(name, "fuzzy")
 
 def tokens(name):
     return [t for t in normalize(name).split() if len(t) > 0]
@@ -58,25 +74,478 @@ def surname(name):
     t = tokens(name)
     return t[-1] if t else ""
 
-def match_score(a, b, weights=(0.4, 0.35, 0.25)):
-    surname_match = 100.0 if surname(a) and surname(a) == surname(b) else 0.0
-    t_overlap = token_overlap_score(a, b)
-    fz = fuzzy_score(normalize(a), normalize(b))
+class NameFeatures:
+    """
+    Per-name record of everything match scoring needs, so each name is
+    normalized once per run instead of several times per scored pair.
+    initials is "<first initial> <surname>" (e.g. "s carson").
+    """
+    __slots__ = ("name", "norm", "token_set", "surname", "initials")
+
+    def __init__(self, name):
+        self.name = name
+        self.norm = normalize(name)
+        toks = self.norm.split()
+        self.token_set = frozenset(toks)
+        self.surname = toks[-1] if toks else ""
+        self.initials = f"{toks[0][0]} {self.surname}" if len(toks) > 1 else self.surname
+
+    @classmethod
+    def from_parts(cls, name, norm, token_set, surname, initials):
+        """
+        Rebuild a record from already computed parts (e.g. the compiled catalog cache).
+        """
+        feat = cls.__new__(cls)
+        feat.name = name
+        feat.norm = norm
+        feat.token_set = frozenset(token_set)
+        feat.surname = surname
+        feat.initials = initials
+        return feat
+
+def match_features(fa, fb, weights=(0.4, 0.35, 0.25)):
+    """
+    Same result as match_score(fa.name, fb.name) computed from NameFeatures records.
+    """
+    if metrics.active:
+        metrics.active.count("match_score_calls")
+    surname_match = 100.0 if fa.surname and fa.surname == fb.surname else 0.0
+    A = fa.token_set; B = fb.token_set
+    t_overlap = 100.0 * (2 * len(A & B) / (len(A) + len(B))) if A and B else 0.0
+    fz = fuzzy_score(fa.norm, fb.norm)
     s = weights[0] * surname_match + weights[1] * t_overlap + weights[2] * fz
     return round(s, 2), round(surname_match, 2), round(t_overlap, 2), round(fz, 2)
 
-def candidate_block(epl_name, pool):
-    e_tokens = set(tokens(epl_name))
-    candidates = [p for p in pool if e_tokens & set(tokens(p))]
-    if not candidates:
-        s = surname(epl_name)
-        if s:
-            candidates = [p for p in pool if surname(p) == s]
-    if not candidates:
-        candidates = pool[:]
-    return candidates
+def match_score(a, b, weights=(0.4, 0.35, 0.25)):
+    return match_features(NameFeatures(a), NameFeatures(b), weights)
+
+MAX_CANDIDATES = 250
+PRUNE_MODES = ("exact", "threshold")
+NGRAM_SIZE = 2
+
+def char_ngrams(norm, n=NGRAM_SIZE):
+    padded = f" {norm} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(("bfpv", "cgjkqsxz", "dt", "l", "mn", "r"), 1)
+                  for c in letters}
+
+def soundex(token):
+    """
+    American Soundex code of a normalized token ("mohamed" and "mohammed" -> "m530"),
+    or "" when it has no letters.
+    """
+    letters = [c for c in token if "a" <= c <= "z"]
+    if not letters:
+        return ""
+    code = letters[0]
+    last = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+MIN_PHONETIC_TOKEN = 3
+
+def blocking_keys(feat):
+    """
+    Keys that pair up spellings sharing no exact token: the Soundex code of each
+    token of MIN_PHONETIC_TOKEN letters or more ("p:"), first initial + surname
+    ("i:", "s carson" for "S. Carson" and "Scott Carson") and the tokens sorted
+    and joined without spaces ("s:", so "heungmin son" meets "son heung min").
+    """
+    keys = {f"p:{soundex(tok)}" for tok in feat.token_set if len(tok) >= MIN_PHONETIC_TOKEN}
+    keys.discard("p:")
+    if feat.initials:
+        keys.add(f"i:{feat.initials}")
+    if feat.token_set:
+        keys.add(f"s:{''.join(sorted(feat.token_set))}")
+    return keys
+
+class CandidateIndex:
+    """
+    Nearest-name index over a list of names (the fantasy pool or the whole catalog).
+    Holds inverted token -> positions, surname -> positions and character
+    n-gram -> positions postings, built once per run. Candidate lists come
+    back in pool order; when a query hits more than max_candidates entries
+    (very common tokens such as "silva"), entries sharing the most tokens,
+    then the surname, are kept. Names sharing no token with any entry are
+    looked up by their blocking_keys (phonetic, initial + surname, sorted
+    tokens), then screened through the n-gram postings, before the whole
+    pool is scored.
+    """
+
+    def __init__(self, pool, max_candidates=MAX_CANDIDATES, features=None):
+        self.pool = list(pool)
+        self.features = features if features is not None else [NameFeatures(p) for p in self.pool]
+        self.max_candidates = max_candidates
+        self.by_token = {}
+        self.by_surname = {}
+        self.by_gram = {}
+        self.gram_counts = []
+        self.by_key = {}
+        for i, feat in enumerate(self.features):
+            for tok in feat.token_set:
+                self.by_token.setdefault(tok, []).append(i)
+            if feat.surname:
+                self.by_surname.setdefault(feat.surname, []).append(i)
+            for key in blocking_keys(feat):
+                self.by_key.setdefault(key, []).append(i)
+            grams = char_ngrams(feat.norm)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.by_gram.setdefault(gram, []).append(i)
+
+    @classmethod
+    def from_postings(cls, pool, features, by_token, by_surname, by_gram, gram_counts, by_key,
+                      max_candidates=MAX_CANDIDATES):
+        """
+        Rebuild an index from precomputed features and postings without re-normalizing.
+        """
+        index = cls.__new__(cls)
+        index.pool = list(pool)
+        index.features = features
+        index.max_candidates = max_candidates
+        index.by_token = by_token
+        index.by_surname = by_surname
+        index.by_gram = by_gram
+        index.gram_counts = gram_counts
+        index.by_key = by_key
+        return index
+
+    def _rank(self, hits, e_surname):
+        positions = sorted(hits)
+        if not self.max_candidates or len(positions) <= self.max_candidates:
+            return positions
+        in_surname = set(self.by_surname.get(e_surname, ())) if e_surname else set()
+        ranked = sorted(positions, key=lambda i: (-hits[i], i not in in_surname, i))
+        return sorted(ranked[:self.max_candidates])
+
+    def _token_hits(self, feat):
+        hits = {}
+        for tok in feat.token_set:
+            for i in self.by_token.get(tok, ()):
+                hits[i] = hits.get(i, 0) + 1
+        if not hits and feat.surname:
+            hits = {i: 1 for i in self.by_surname.get(feat.surname, ())}
+        return hits
+
+    def _key_hits(self, feat):
+        hits = {}
+        for key in blocking_keys(feat):
+            for i in self.by_key.get(key, ()):
+                hits[i] = hits.get(i, 0) + 1
+        return hits
+
+    def _gram_positions(self, feat):
+        """
+        Entries sharing character n-grams with the query, best max_candidates by
+        n-gram Dice similarity, in pool order.
+        """
+        grams = char_ngrams(feat.norm)
+        hits = {}
+        for gram in grams:
+            for i in self.by_gram.get(gram, ()):
+                hits[i] = hits.get(i, 0) + 1
+        positions = sorted(hits)
+        if not self.max_candidates or len(positions) <= self.max_candidates:
+            return positions
+        dice = {i: hits[i] / (len(grams) + self.gram_counts[i]) for i in positions}
+        ranked = sorted(positions, key=lambda i: (-dice[i], i))
+        return sorted(ranked[:self.max_candidates])
+
+    def lookup(self, feat):
+        """
+        (positions, source) of the candidate block for a NameFeatures query;
+        source says which postings produced it: "token", "key" (blocking-key
+        hits merged with the n-gram screen), "ngram" or "full_pool" when
+        nothing matched and the whole pool is returned.
+        """
+        hits = self._token_hits(feat)
+        if hits:
+            return self._rank(hits, feat.surname), "token"
+        # Key hits widen the n-gram screen rather than replace it: a loose
+        # phonetic hit must not hide closer spellings the n-grams find.
+        hits = self._key_hits(feat)
+        positions = self._gram_positions(feat)
+        if hits:
+            return sorted(set(self._rank(hits, feat.surname)).union(positions)), "key"
+        if positions:
+            return positions, "ngram"
+        return list(range(len(self.pool))), "full_pool"
+
+    def positions(self, feat):
+        """
+        Pool positions of the candidate block for a NameFeatures query.
+        """
+        positions, source = self.lookup(feat)
+        if source != "token" and metrics.active:
+            metrics.active.count(f"{source}_fallbacks")
+        return positions
+
+    def candidates(self, epl_name):
+        return [self.pool[i] for i in self.positions(NameFeatures(epl_name))]
+
+    def top_k(self, name, k=5, min_score=0, weights=(0.4, 0.35, 0.25)):
+        """
+        Best k (position, score, surname_match, token_overlap, fuzzy) tuples with
+        score >= min_score, best first, ties in pool order.
+        A candidate's fuzzy component is only computed when its surname and token
+        overlap leave room to reach min_score or beat the current k-th best.
+        Only entries sharing a token can reach a min_score above the fuzzy
+        weight, so the search is exact there; below it, entries sharing no
+        token are screened through the blocking-key and n-gram postings.
+        """
+        feat = name if isinstance(name, NameFeatures) else NameFeatures(name)
+        hits = self._token_hits(feat)
+        if min_score <= weights[2] * 100:
+            positions = sorted(set(hits).union(self._key_hits(feat), self._gram_positions(feat)))
+        else:
+            positions = sorted(hits)
+        return self.best_of(feat, positions, k=k, min_score=min_score, weights=weights)
+
+    def best_of(self, feat, positions, k=5, min_score=0, weights=(0.4, 0.35, 0.25)):
+        """
+        Pruned scoring of the entries at `positions`: the best k
+        (position, score, surname_match, token_overlap, fuzzy) tuples with
+        score >= min_score, best first, ties in pool order. Same tuples a full
+        score-and-sort would rank first.
+        """
+        A = feat.token_set
+        bounded = []
+        for i in positions:
+            cand = self.features[i]
+            sm = 100.0 if feat.surname and feat.surname == cand.surname else 0.0
+            B = cand.token_set
+            to = 100.0 * (2 * len(A & B) / (len(A) + len(B))) if A and B else 0.0
+            bound = round(weights[0] * sm + weights[1] * to + weights[2] * 100, 2)
+            if bound >= min_score:
+                bounded.append((-bound, i, sm, to))
+        # Most promising first, so the heap fills with strong entries early and
+        # the first candidate that can't beat the k-th best ends the scan.
+        bounded.sort()
+        pruned = len(positions) - len(bounded)
+        heap = []
+        for n, (neg_bound, i, sm, to) in enumerate(bounded):
+            if len(heap) == k and (-neg_bound, -i) <= heap[0][:2]:
+                pruned += len(bounded) - n
+                break
+            if metrics.active:
+                metrics.active.count("match_score_calls")
+            fz = fuzzy_score(feat.norm, self.features[i].norm)
+            s = round(weights[0] * sm + weights[1] * to + weights[2] * fz, 2)
+            if s < min_score:
+                continue
+            entry = (s, -i, (i, s, round(sm, 2), round(to, 2), round(fz, 2)))
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+        if pruned and metrics.active:
+            metrics.active.count("pruned_candidates", pruned)
+        return [e[2] for e in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+
+def candidate_block(epl_name, pool, index=None):
+    if index is None:
+        index = CandidateIndex(pool)
+    return index.candidates(epl_name)
+
+def score_matrix(queries, candidates, weights=(0.4, 0.35, 0.25), workers=-1):
+    """
+    Vectorized match_features over every queries x candidates pair (lists of NameFeatures).
+    The fuzzy component comes from rapidfuzz.process.cdist, surname and token
+    overlap are NumPy arrays. Returns unrounded float64 arrays of shape
+    (len(queries), len(candidates)): score, surname_match, token_overlap, fuzzy.
+    """
+    if metrics.active:
+        metrics.active.count("match_score_calls", len(queries) * len(candidates))
+    fz = process.cdist([q.norm for q in queries], [c.norm for c in candidates],
+                       scorer=fuzz.token_set_ratio, dtype=np.float64, workers=workers)
+
+    surname_ids = {}
+    q_sur = np.array([surname_ids.setdefault(q.surname, len(surname_ids)) if q.surname else -1 for q in queries])
+    c_sur = np.array([surname_ids.get(c.surname, -2) for c in candidates])
+    surname_match = np.where(q_sur[:, None] == c_sur[None, :], 100.0, 0.0)
+
+    vocab = {}
+    for q in queries:
+        for t in q.token_set:
+            vocab.setdefault(t, len(vocab))
+    q_inc = np.zeros((len(queries), len(vocab)), dtype=np.int32)
+    c_inc = np.zeros((len(candidates), len(vocab)), dtype=np.int32)
+    for r, q in enumerate(queries):
+        q_inc[r, [vocab[t] for t in q.token_set]] = 1
+    # One scatter for all candidates: a fancy assignment per row costs more than the product.
+    hits = [(r, vocab[t]) for r, c in enumerate(candidates) for t in c.token_set if t in vocab]
+    if hits:
+        rows, cols = zip(*hits)
+        c_inc[rows, cols] = 1
+    common = q_inc @ c_inc.T
+    q_len = np.array([len(q.token_set) for q in queries])
+    c_len = np.array([len(c.token_set) for c in candidates])
+    sizes = q_len[:, None] + c_len[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_overlap = np.where((q_len[:, None] > 0) & (c_len[None, :] > 0),
+                             100.0 * (2 * common / sizes), 0.0)
+
+    score = weights[0] * surname_match + weights[1] * t_overlap + weights[2] * fz
+    return score, surname_match, t_overlap, fz
+
+def round_matrix(m, ndigits=2):
+    """
+    round(value, ndigits) of every entry, vectorized. Scaling and rint pick
+    the same decimal as round() except right at a tie, so those few entries
+    go through round() itself.
+    """
+    scale = 10.0 ** ndigits
+    scaled = m * scale
+    out = np.rint(scaled) / scale
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        out[ties] = [round(v, ndigits) for v in m[ties].tolist()]
+    return out
+
+BATCH_CHUNK = 64
+# EPL names whose candidate blocks are computed and grouped together.
+BATCH_WINDOW = 1024
+# A group is scored against the union of its blocks only while that costs at
+# most this many times the pairs of the blocks themselves.
+BATCH_WASTE = 1.5
+
+def batch_groups(blocks, chunk=BATCH_CHUNK, waste=BATCH_WASTE):
+    """
+    Row numbers of blocks split into groups of at most chunk rows whose
+    rows x union matrix stays within waste times their own pairs. Rows are
+    taken in order of their sorted block, so identical and overlapping blocks
+    end up side by side; a row that would break the limit starts a new group.
+    """
+    groups = []
+    rows, union, pairs = [], set(), 0
+    for r in sorted(range(len(blocks)), key=lambda r: sorted(blocks[r])):
+        grown = union.union(blocks[r])
+        if rows and (len(rows) >= chunk or (len(rows) + 1) * len(grown) > waste * (pairs + len(blocks[r]))):
+            groups.append(rows)
+            rows, grown, pairs = [], set(blocks[r]), 0
+        rows.append(r)
+        union = grown
+        pairs += len(blocks[r])
+    if rows:
+        groups.append(rows)
+    return groups
+
+def score_blocks_batch(e_feats, index, workers=-1, chunk=BATCH_CHUNK, with_seconds=False):
+    """
+    Batch counterpart of score_block: yields the same sorted scored lists.
+    EPL names are grouped by batch_groups and each group is scored as one
+    matrix against the union of its candidate blocks, so a name never pays for
+    much more than its own block.
+    with_seconds=True yields (scored, seconds) pairs instead, seconds being the
+    name's own share of the work: its block lookup, an even split of its
+    group's matrix scoring and the time spent extracting its row.
+    """
+    for start in range(0, len(e_feats), BATCH_WINDOW):
+        feats = e_feats[start:start + BATCH_WINDOW]
+        seconds = [0.0] * len(feats)
+        blocks = []
+        for r, f in enumerate(feats):
+            started = time.perf_counter()
+            blocks.append(index.positions(f))
+            seconds[r] = time.perf_counter() - started
+        results = [None] * len(feats)
+        for rows in batch_groups(blocks, chunk):
+            started = time.perf_counter()
+            columns = sorted(set().union(*(blocks[r] for r in rows)))
+            col_of = {pos: c for c, pos in enumerate(columns)}
+            matrices = [round_matrix(m) for m in
+                        score_matrix([feats[r] for r in rows], [index.features[i] for i in columns], workers=workers)]
+            shared = (time.perf_counter() - started) / len(rows)
+            for row, r in enumerate(rows):
+                started = time.perf_counter()
+                cols = [col_of[i] for i in blocks[r]]
+                values = [m[row, cols].tolist() for m in matrices]
+                scored = [(index.pool[i], *v) for i, *v in zip(blocks[r], *values)]
+                scored.sort(key=lambda x: x[1], reverse=True)
+                results[r] = scored
+                seconds[r] += shared + time.perf_counter() - started
+        for scored, s in zip(results, seconds):
+            yield (scored, s) if with_seconds else scored
 
-def map_players(epl_list, fantasy_list, threshold=70):
+def timed_blocks(score, e_feats):
+    """
+    (scored, candidate block size, seconds) for every feature, score(feat)
+    returning (scored, candidate block size).
+    """
+    for f in e_feats:
+        started = time.perf_counter()
+        scored, n_candidates = score(f)
+        yield scored, n_candidates, time.perf_counter() - started
+
+def score_block(e_feat, index):
+    """
+    Scored (name, score, surname_match, token_overlap, fuzzy) tuples for the
+    candidate block of e_feat, best first (ties keep pool order).
+    """
+    scored = []
+    for i in index.positions(e_feat):
+        s, sm, to, fz = match_features(e_feat, index.features[i])
+        scored.append((index.pool[i], s, sm, to, fz))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored
+
+def score_block_pruned(e_feat, index, k=5, min_score=0):
+    """
+    The first k entries score_block would return (only those >= min_score),
+    computing the fuzzy component only for candidates that can still make it.
+    Returns (scored, candidate block size).
+    """
+    positions = index.positions(e_feat)
+    top = index.best_of(e_feat, positions, k=k, min_score=min_score)
+    return [(index.pool[i], s, sm, to, fz) for i, s, sm, to, fz in top], len(positions)
+
+def score_team_block(e_feat, index, teams, team_blocks, threshold, k=5):
+    """
+    Top k of e_feat within the pool entries of its fixture's teams, with the
+    candidate block size, or None when no team entry reaches threshold.
+    """
+    positions = sorted(set().union(*(team_blocks.get(normalize(t), ()) for t in teams)))
+    if not positions:
+        return None
+    top = index.best_of(e_feat, positions, k=k)
+    if not top or top[0][1] < threshold:
+        return None
+    return [(index.pool[i], s, sm, to, fz) for i, s, sm, to, fz in top], len(positions)
+
+def team_block_mapping(epl_list, index, contexts, team_blocks, threshold):
+    """
+    map_players records of the names whose fixture block has an entry reaching
+    threshold, scored within that block only; None for the others.
+    """
+    records = []
+    for e, teams in zip(epl_list, contexts):
+        hit = score_team_block(NameFeatures(e), index, teams, team_blocks, threshold) if teams else None
+        records.append(mapping_record(e, hit[0]) if hit is not None else None)
+    return records
+
+def mapping_record(e, scored):
+    top = scored[:5]
+    best = top[0] if top else None
+    return {
+        "epl": e,
+        "best_match": best[0] if best else None,
+        "best_score": best[1] if best else None,
+        "candidates_top3": [
+            {"name": t[0], "score": t[1], "surname_match": t[2], "token_overlap": t[3], "fuzzy": t[4]}
+            for t in top[:3]
+        ]
+    }
+
+def map_players(epl_list, fantasy_list, threshold=70, index=None, batch=False, workers=-1, prune=None,
+                contexts=None, team_blocks=None):
     """
     Returns a list of mapping dictionaries:
     {
@@ -86,34 +555,137 @@ def map_players(epl_list, fantasy_list, threshold=70):
     "candidates_top3": [ {name, score, surname_match, token_overlap, fuzzy}, ... ]
     }
     Note: best_match is set to the top candidate if any (so you can always see who was top).
+    Pass a prebuilt CandidateIndex over fantasy_list to reuse it across calls.
+    batch=True scores through score_matrix (rapidfuzz cdist + NumPy, `workers` threads)
+    when available and falls back to per-pair scoring otherwise; results are identical.
+    prune="exact" keeps a 5-entry heap and skips the fuzzy component of
+    candidates whose surname and token overlap can't beat the current 5th best;
+    results are identical. prune="threshold" also skips candidates that can't
+    reach threshold: accepted matches are unchanged, but names left below the
+    threshold get an empty best_match and report.
+    contexts (the fixture teams of every EPL name) and team_blocks (build_team_blocks)
+    turn on event blocking: a name is first scored against the pool entries of
+    its fixture's teams only, and goes through the global index when nothing
+    there reaches threshold.
     """
-    results = []
-    for e in epl_list:
-        cands = candidate_block(e, fantasy_list)
-        scored = []
-        for f in cands:
-            s, sm, to, fz = match_score(e, f)
-            scored.append((f, s, sm, to, fz))
-        scored.sort(key=lambda x: x[1], reverse=True)
-        top = scored[:5]
-        best = top[0] if top else None
-        results.append({
-            "epl": e,
-            "best_match": best[0] if best else None,
-            "best_score": best[1] if best else None,
-            "candidates_top3": [
-                {"name": t[0], "score": t[1], "surname_match": t[2], "token_overlap": t[3], "fuzzy": t[4]}
-                for t in top[:3]
-            ]
-        })
-    return results
+    return list(iter_map_players(epl_list, fantasy_list, threshold=threshold, index=index, batch=batch,
+                                 workers=workers, prune=prune, contexts=contexts, team_blocks=team_blocks))
+
+def iter_map_players(epl_list, fantasy_list, threshold=70, index=None, batch=False, workers=-1, prune=None,
+                     contexts=None, team_blocks=None):
+    """
+    map_players as a generator: each record is yielded as soon as its name is
+    scored, so a consumer can write it out before the next name is scored.
+    Only the team-block pre-pass (top 5 per blocked name) runs up front.
+    """
+    if index is None:
+        index = CandidateIndex(fantasy_list)
+    e_feats = [NameFeatures(e) for e in epl_list]
+    blocked = {}
+    block_seconds = {}
+    if team_blocks and contexts:
+        for i, (f, teams) in enumerate(zip(e_feats, contexts)):
+            if not teams:
+                continue
+            started = time.perf_counter()
+            hit = score_team_block(f, index, teams, team_blocks, threshold)
+            block_seconds[i] = time.perf_counter() - started
+            if hit is not None:
+                blocked[i] = hit
+        if metrics.active:
+            metrics.active.count("team_block_hits", len(blocked))
+            metrics.active.count("team_block_fallbacks", len(e_feats) - len(blocked))
+        e_feats = [f for i, f in enumerate(e_feats) if i not in blocked]
+    if prune:
+        min_score = threshold if prune == "threshold" else 0
+        blocks = timed_blocks(lambda f: score_block_pruned(f, index, min_score=min_score), e_feats)
+    elif batch and has_batch_scoring:
+        blocks = ((scored, len(scored), seconds)
+                  for scored, seconds in score_blocks_batch(e_feats, index, workers=workers, with_seconds=True))
+    else:
+        def score_sized(f):
+            scored = score_block(f, index)
+            return scored, len(scored)
+        blocks = timed_blocks(score_sized, e_feats)
+    m = metrics.active
+    if m is None and not blocked:
+        for e, (scored, _, _) in zip(epl_list, blocks):
+            yield mapping_record(e, scored)
+        return
+    for i, e in enumerate(epl_list):
+        # A name's time is its own scoring: the team block attempt, plus the
+        # global scoring when the block had nothing reaching threshold.
+        if i in blocked:
+            scored, n_candidates = blocked[i]
+            seconds = block_seconds[i]
+        else:
+            scored, n_candidates, seconds = next(blocks)
+            seconds += block_seconds.get(i, 0.0)
+        if m is not None:
+            m.record_query(e, seconds, n_candidates)
+            m.observe("candidates_per_query", n_candidates)
+        yield mapping_record(e, scored)
+
+_worker_index = None
+_worker_team_blocks = None
+
+def _init_worker(fantasy_list, max_candidates, slowest_n=None, team_blocks=None):
+    global _worker_index, _worker_team_blocks
+    if slowest_n is None:
+        metrics.disable()
+    else:
+        metrics.enable(slowest_n=slowest_n)
+    _worker_index = CandidateIndex(fantasy_list, max_candidates=max_candidates)
+    _worker_team_blocks = team_blocks
+
+def _map_shard(args):
+    shard, threshold, batch, score_workers, prune, contexts = args
+    results = map_players(shard, _worker_index.pool, threshold=threshold, index=_worker_index,
+                          batch=batch, workers=score_workers, prune=prune,
+                          contexts=contexts, team_blocks=_worker_team_blocks)
+    if not metrics.active:
+        return results, None
+    worker_metrics = metrics.active.to_dict()
+    metrics.enable(slowest_n=metrics.active.slowest_n)
+    return results, worker_metrics
+
+def map_players_parallel(epl_list, fantasy_list, workers, threshold=70, index=None, batch=False, score_workers=-1,
+                         prune=None, contexts=None, team_blocks=None, shards_per_worker=4):
+    """
+    map_players over a process pool. epl_list is cut into contiguous shards and
+    every worker builds its CandidateIndex once, in the pool initializer, so the
+    pool is pickled once per worker rather than once per task. Results come
+    back in input order, identical to a serial run.
+    """
+    return list(iter_map_players_parallel(epl_list, fantasy_list, workers, threshold=threshold, index=index,
+                                          batch=batch, score_workers=score_workers, prune=prune,
+                                          contexts=contexts, team_blocks=team_blocks,
+                                          shards_per_worker=shards_per_worker))
+
+def iter_map_players_parallel(epl_list, fantasy_list, workers, threshold=70, index=None, batch=False,
+                              score_workers=-1, prune=None, contexts=None, team_blocks=None, shards_per_worker=4):
+    """
+    map_players_parallel as a generator yielding each shard's records, in
+    input order, as soon as that shard is done.
+    """
+    max_candidates = index.max_candidates if index is not None else MAX_CANDIDATES
+    if workers <= 1 or len(epl_list) < 2:
+        yield from iter_map_players(epl_list, fantasy_list, threshold=threshold, index=index, batch=batch,
+                                    workers=score_workers, prune=prune, contexts=contexts, team_blocks=team_blocks)
+        return
+    size = -(-len(epl_list) // (workers * shards_per_worker))
+    shards = [(epl_list[i:i + size], threshold, batch, score_workers, prune, contexts[i:i + size] if contexts else None)
+              for i in range(0, len(epl_list), size)]
+    slowest_n = metrics.active.slowest_n if metrics.active else None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(list(fantasy_list), max_candidates, slowest_n, team_blocks)) as executor:
+        for part, worker_metrics in executor.map(_map_shard, shards):
+            if worker_metrics:
+                metrics.active.merge(worker_metrics)
+            yield from part
 
 def transliterate(text):
-    if text is None:
-        return None
-    s = unicodedata.normalize("NFKD", text)
-    s = "".join(c for c in s if not unicodedata.combining(c))
-    return s
+    return normalization.normalize(text, "accents")
 
 def prepare_export_player(raw_player):
     db_name = raw_player.get("display_name") or raw_player.get("name") or raw_player.get("common_name")
@@ -134,50 +706,19 @@ def prepare_export_player(raw_player):
         "created_at": {"$date": created_iso}
     }
 
-def export_individual_player(raw_player, file_path="output_files/mapped_players.json", dry_run=False):
+def export_individual_player(raw_player, file_path=MAPPED_PLAYERS_PATH, dry_run=False, store=None):
     """
     Export reduced player object (not full raw dict).
     Duplicate detection via player_api_id or player_id.$oid.
+    When a MappedPlayerStore is passed the write is deferred to store.flush().
     """
     exported = prepare_export_player(raw_player)
-    players = []
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                players = json.load(f)
-                if not isinstance(players, list):
-                    players = [players]
-        except json.JSONDecodeError:
-            players = []
-
-    api_id = exported.get("player_api_id")
-    db_oid = None
-    pid = exported.get("player_id")
-    if isinstance(pid, dict):
-        db_oid = pid.get("$oid") or pid.get("oid") or None
-
-    duplicate = False
-    if api_id is not None:
-        duplicate = any(isinstance(p, dict) and p.get("player_api_id") == api_id for p in players)
-    elif db_oid:
-        duplicate = any(isinstance(p, dict)
-                        and isinstance(p.get("player_id"), dict)
-                        and p.get("player_id").get("$oid") == db_oid
-                        for p in players)
-    else:
-        duplicate = exported in players
-
-    if duplicate:
-        return False
-
-    if dry_run:
-        return True
-
-    players.append(exported)
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(players, f, indent=4, ensure_ascii=False)
-    return True
+    if store is not None:
+        return store.add(exported)
+    store = MappedPlayerStore(file_path, dry_run=dry_run)
+    added = store.add(exported)
+    store.flush()
+    return added
 
 def build_normalized_maps(full_fantasy_data):
     by_display = {}
@@ -191,84 +732,523 @@ def build_normalized_maps(full_fantasy_data):
             by_name.setdefault(normalize(n), []).append(p)
     return by_display, by_name
 
+TEAM_FIELDS = ("team_name", "team")
+
+def player_team(player):
+    for field in TEAM_FIELDS:
+        team = player.get(field)
+        if isinstance(team, dict):
+            team = team.get("name")
+        if team:
+            return team
+    return None
+
+def pick_player(candidates, teams=()):
+    """
+    The catalog player a matched name stands for: the first of candidates
+    playing for one of the fixture's teams, else the first one.
+    """
+    if teams and len(candidates) > 1:
+        wanted = {normalize(t) for t in teams}
+        for p in candidates:
+            team = player_team(p)
+            if team and normalize(team) in wanted:
+                return p
+    return candidates[0]
+
+def same_name_players(norm, map_display, map_name, teams=()):
+    """
+    Catalog players a normalized pool name stands for: its display-name
+    players, else its name players. With fixture teams, both lists are
+    searched so pick_player can find the fixture's player either way.
+    """
+    if teams:
+        return (map_display.get(norm) or []) + (map_name.get(norm) or [])
+    return map_display.get(norm) or map_name.get(norm)
+
+def build_team_blocks(fantasy_pool, map_display, map_name):
+    """
+    normalized team name -> positions in fantasy_pool of that team's players,
+    from the catalog's team fields. Empty when the catalog carries no teams.
+    """
+    blocks = {}
+    for pos, name in enumerate(fantasy_pool):
+        norm = normalize(name)
+        teams = {normalize(t) for t in map(player_team, map_display.get(norm) or map_name.get(norm) or []) if t}
+        for team in teams:
+            blocks.setdefault(team, []).append(pos)
+    return blocks
+
+def catalog_display_names(full_fantasy_data):
+    return [p.get("display_name") or p.get("name") or "" for p in full_fantasy_data]
+
+FUZZY_RESULTS_PATH = "intermediary_files/fuzzy_mapping_results.json"
+FUZZY_RESULTS_NDJSON_PATH = "intermediary_files/fuzzy_mapping_results.ndjson"
+OUTPUT_FORMATS = ("json", "ndjson")
+REMAINING_AFTER_FUZZY_PATH = "intermediary_files/remaining_fantasy_display_names_after_fuzzy.csv"
+
 def run_stage3(
     epl_leftover_csv="intermediary_files/epl_players_remained_after_second_iter.csv",
     fantasy_pool_csv="intermediary_files/remaining_fantasy_display_names.csv",
     full_fantasy_json="input_files/Fantasy_LiveScoring.players.json",
     threshold=70,
-    dry_run=False
+    dry_run=False,
+    flush_every=None,
+    batch_scoring=False,
+    score_workers=-1,
+    workers=1,
+    prune=None,
+    output_format="json",
+    quiet=False,
+    runner_events_csv="intermediary_files/epl_runner_events.csv",
+    assignment=None
 ):
-    mode = "DRY-RUN (no changes to mapped_players.json)" if dry_run else "LIVE (will write to mapped_players.json)"
+    with metrics.stage("fuzzy.load_inputs"):
+        epl_list = load_csv(epl_leftover_csv)
+        fantasy_pool = load_csv(fantasy_pool_csv)
+        full_fantasy = PlayerTable.from_players(stream_fantasy_players(full_fantasy_json))
+        runner_teams = load_runner_teams(runner_events_csv) if os.path.exists(runner_events_csv) else None
+    store = None
+    results_path = FUZZY_RESULTS_PATH
+    if output_format == "ndjson":
+        store = MappedPlayerStore(MAPPED_PLAYERS_NDJSON_PATH, dry_run=dry_run, batch_size=flush_every,
+                                  seed_path=MAPPED_PLAYERS_PATH)
+        results_path = FUZZY_RESULTS_NDJSON_PATH
+    mapping = fuzzy_stage(
+        epl_list,
+        fantasy_pool,
+        full_fantasy,
+        threshold=threshold,
+        dry_run=dry_run,
+        flush_every=flush_every,
+        batch_scoring=batch_scoring,
+        score_workers=score_workers,
+        store=store,
+        results_path=results_path,
+        remaining_path=REMAINING_AFTER_FUZZY_PATH,
+        workers=workers,
+        prune=prune,
+        quiet=quiet,
+        runner_teams=runner_teams,
+        assignment=assignment
+    )
+    if store is not None:
+        store.close()
+    return mapping
+
+def fuzzy_stage(
+    epl_list,
+    fantasy_pool,
+    full_fantasy,
+    threshold=70,
+    dry_run=False,
+    flush_every=None,
+    batch_scoring=False,
+    score_workers=-1,
+    store=None,
+    results_path=FUZZY_RESULTS_PATH,
+    remaining_path=None,
+    normalized_maps=None,
+    catalog_index=None,
+    workers=1,
+    prune=None,
+    resolved=None,
+    quiet=False,
+    runner_teams=None,
+    assignment=None
+):
+    """
+    In-memory body of stage 3: fuzzy-match epl_list against fantasy_pool, export
+    accepted matches and write the mapping results. Returns the mapping with
+    export status, or with an .ndjson results_path only the counts
+    {"names": ..., "exported": ...}. remaining_path (the leftover pool CSV) is only written when given.
+    normalized_maps (build_normalized_maps) and catalog_index (a CandidateIndex over
+    the catalog display names) can be passed in prebuilt, e.g. from the catalog cache.
+    workers > 1 shards the EPL names over a process pool (map_players_parallel).
+    prune is passed to map_players ("exact" or "threshold").
+    When a dict is passed as resolved, every accepted name is recorded in it as
+    name -> (chosen player, score).
+    A results_path ending in .ndjson is streamed one record per line: without
+    assignment each name is scored, exported and written before the next one
+    (iter_map_players), so no result list is held. quiet skips the per-name
+    candidate dump.
+    runner_teams (runner name -> fixture teams) enables event blocking in
+    map_players when the catalog has team fields.
+    assignment ("greedy" or "optimal") replaces accepting every name's best
+    match on its own with a one-to-one assignment over the top candidates
+    (assign_matches); players already in the store count as taken, and
+    contested players are reported to CONTESTED_MATCHES_PATH.
+    """
+    target = os.path.basename(store.file_path if store is not None else MAPPED_PLAYERS_PATH)
+    mode = f"DRY-RUN (no changes to {target})" if dry_run else f"LIVE (will write to {target})"
     print(f"Running fuzzy stage with threshold = {threshold} — {mode}")
-    epl_list = load_csv(epl_leftover_csv)
-    fantasy_pool = load_csv(fantasy_pool_csv)
-    full_fantasy = load_json(full_fantasy_json)
 
-    map_display, map_name = build_normalized_maps(full_fantasy)
+    ndjson = results_path.endswith(".ndjson")
+    # Scoring then happens inside the export loop below, one name at a time.
+    streaming = ndjson and not assignment
+    with metrics.stage("fuzzy.map_players"):
+        map_display, map_name = normalized_maps or build_normalized_maps(full_fantasy)
+        team_blocks = build_team_blocks(fantasy_pool, map_display, map_name) if runner_teams else None
+        contexts = [runner_teams.get(e, ()) for e in epl_list] if team_blocks else None
 
-    mapping = map_players(epl_list, fantasy_pool, threshold=threshold)
+        if workers > 1:
+            mapping = iter_map_players_parallel(epl_list, fantasy_pool, workers, threshold=threshold,
+                                                batch=batch_scoring, score_workers=score_workers, prune=prune,
+                                                contexts=contexts, team_blocks=team_blocks)
+        else:
+            pool_index = CandidateIndex(fantasy_pool)
+            mapping = iter_map_players(epl_list, fantasy_pool, threshold=threshold, index=pool_index,
+                                       batch=batch_scoring, workers=score_workers, prune=prune,
+                                       contexts=contexts, team_blocks=team_blocks)
+        if not streaming:
+            mapping = list(mapping)
 
-    for r in mapping:
+    def print_candidates(r):
         print("EPL:", r["epl"])
         print("  Best match:", r["best_match"], "Score:", r["best_score"])
         print("  Top candidates:")
         for c in r["candidates_top3"]:
             print("    -", c["name"], f"(score={c['score']}, surname_match={c['surname_match']}, token_overlap={c['token_overlap']}, fuzzy={c['fuzzy']})")
         print()
+
+    for r in ([] if quiet or streaming else mapping):
+        print_candidates(r)
     print("rapidfuzz available:", has_rapidfuzz)
     print()
 
-    exported_count = 0
-    matched_fantasy_set = set()
-    mapping_with_export_status = []
-
-    for r in mapping:
-        best_name = r["best_match"]
-        best_score = r["best_score"] if r["best_score"] is not None else -1
-        exported = False
-        exported_player_id = None
-
-        if best_name is not None and best_score >= threshold:
-            norm_best = normalize(best_name)
-            candidates = map_display.get(norm_best) or map_name.get(norm_best) or []
-
-            if not candidates:
-                best_fallback = None
-                for p in full_fantasy:
-                    disp = p.get("display_name") or p.get("name") or ""
-                    s, *_ = match_score(r["epl"], disp)
-                    if best_fallback is None or s > best_fallback[0]:
-                        best_fallback = (s, p)
-                if best_fallback and best_fallback[0] >= threshold:
-                    candidates = [best_fallback[1]]
-
-            if candidates:
-                chosen_player = candidates[0]
-                exported = export_individual_player(chosen_player, dry_run=dry_run)
+    def player_for(name, epl, teams=(), fallback=True):
+        """
+        Catalog player of a pool name, preferring one from the runner's fixture
+        teams; with fallback, one the name doesn't resolve to comes from the
+        catalog index instead.
+        """
+        nonlocal catalog_index
+        candidates = same_name_players(normalize(name), map_display, map_name, teams)
+        if candidates:
+            return pick_player(candidates, teams)
+        if not fallback:
+            return None
+        if metrics.active:
+            metrics.active.count("catalog_fallbacks")
+        if catalog_index is None:
+            catalog_index = CandidateIndex(catalog_display_names(full_fantasy))
+        best_fallback = catalog_index.top_k(epl, k=1, min_score=threshold)
+        return full_fantasy[best_fallback[0][0]] if best_fallback else None
+
+    own_store = store is None
+    if own_store:
+        store = MappedPlayerStore(MAPPED_PLAYERS_PATH, dry_run=dry_run, batch_size=flush_every)
+
+    assigned = None
+    if assignment:
+        with metrics.stage("fuzzy.assign"):
+            assigned = assign_matches(mapping, threshold, player_for, mode=assignment, runner_teams=runner_teams,
+                                      taken=store.player_keys())
+
+    with metrics.stage("fuzzy.export"):
+        exported_count = 0
+        matched_fantasy_set = set()
+        mapping_with_export_status = []
+        results_writer = NDJSONWriter(results_path) if ndjson else None
+
+        names_count = 0
+        for n, r in enumerate(mapping):
+            names_count += 1
+            if streaming and not quiet:
+                print_candidates(r)
+            best_name = r["best_match"]
+            best_score = r["best_score"] if r["best_score"] is not None else -1
+            exported = False
+            exported_player_id = None
+
+            choice = None
+            if assigned is not None:
+                choice = assigned.get(n)
+            elif best_name is not None and best_score >= threshold:
+                chosen_player = player_for(best_name, r["epl"], runner_teams.get(r["epl"], ()) if runner_teams else ())
+                if chosen_player is not None:
+                    choice = (chosen_player, best_name, best_score)
+
+            if choice is not None:
+                chosen_player, chosen_name, chosen_score = choice
+                exported = export_individual_player(chosen_player, store=store)
                 if exported:
                     exported_count += 1
                 exported_player_id = chosen_player.get("id")
+                if resolved is not None:
+                    resolved[r["epl"]] = (chosen_player, chosen_score)
                 if exported:
-                    matched_fantasy_set.add(best_name)
+                    matched_fantasy_set.add(chosen_name)
 
-        mapping_with_export_status.append({
-            **r,
-            "exported": exported,
-            "exported_player_id": exported_player_id
-        })
+            record = {
+                **r,
+                "exported": exported,
+                "exported_player_id": exported_player_id
+            }
+            if assigned is not None:
+                record["assigned_match"] = choice[1] if choice else None
+                record["assigned_score"] = choice[2] if choice else None
+            if results_writer is not None:
+                results_writer.write(record)
+            else:
+                mapping_with_export_status.append(record)
+
+        if own_store:
+            store.close()
+        else:
+            store.flush()
 
-    write_json("intermediary_files/fuzzy_mapping_results.json", mapping_with_export_status)
+    if results_writer is not None:
+        results_writer.close()
+    else:
+        write_json(results_path, mapping_with_export_status)
 
-    os.makedirs("intermediary_files", exist_ok=True)
-    remaining_after = [n for n in fantasy_pool if n not in matched_fantasy_set]
-    with open("intermediary_files/remaining_fantasy_display_names_after_fuzzy.csv", "w", encoding="utf-8") as f:
-        for n in remaining_after:
-            f.write(n + "\n")
+    if remaining_path:
+        os.makedirs(os.path.dirname(remaining_path), exist_ok=True)
+        remaining_after = [n for n in fantasy_pool if n not in matched_fantasy_set]
+        with open(remaining_path, "w", encoding="utf-8") as f:
+            for n in remaining_after:
+                f.write(n + "\n")
 
     if dry_run:
         print(f"DRY-RUN: {exported_count} player(s) would have been exported (no files modified).")
     else:
-        print(f"Fuzzy stage done. Exported {exported_count} new player(s) to output_files/mapped_players.json")
+        print(f"Fuzzy stage done. Exported {exported_count} new player(s) to {store.file_path}")
+    if ndjson:
+        return {"names": names_count, "exported": exported_count}
+    return mapping_with_export_status
+
+CONTESTED_MATCHES_PATH = "intermediary_files/contested_matches.json"
+
+def assignment_key(player):
+    return player_key(player) or json.dumps(dict(player), sort_keys=True, ensure_ascii=False)
+
+def assign_matches(mapping, threshold, player_for, mode="greedy", report_path=CONTESTED_MATCHES_PATH,
+                   runner_teams=None, taken=()):
+    """
+    One-to-one assignment of catalog players to the accepted names of a
+    mapping. Every top-3 candidate scoring >= threshold is an edge of a sparse
+    runner x player graph (the first one resolved through player_for with its
+    catalog fallback, the others only through the normalized maps); edges go
+    to assignment.greedy_assign or, for "optimal", an exact assignment per
+    connected component. Players that were the first choice of several names
+    are written to report_path with who got them and what the others got.
+    runner_teams lets player_for prefer the player of the runner's fixture.
+    Runners are the distinct EPL names: rows repeating a name share its assignment.
+    The constraint spans stages: taken holds the assignment keys of players
+    already mapped (by the exact stage or the alias cache), and no edge leads
+    to one of them.
+    Returns mapping position -> (player, candidate name, score).
+    """
+    runner_of = {}
+    for n, r in enumerate(mapping):
+        runner_of.setdefault(r["epl"], n)
+    edges = []
+    for n, r in enumerate(mapping):
+        if runner_of[r["epl"]] != n:
+            continue
+        if r["best_match"] is None or r["best_score"] is None or r["best_score"] < threshold:
+            continue
+        teams = runner_teams.get(r["epl"], ()) if runner_teams else ()
+        for rank, c in enumerate(r["candidates_top3"]):
+            if c["score"] < threshold:
+                break
+            player = player_for(c["name"], r["epl"], teams, fallback=rank == 0)
+            if player is not None and assignment_key(player) not in taken:
+                edges.append((n, assignment_key(player), c["score"], rank, player, c["name"]))
+    assigned = assigner.assign(edges, mode)
+    contests = assigner.contested(edges, assigned)
+
+    report = []
+    for _, claims, winner in contests:
+        player = claims[0][4]
+        report.append({
+            "player_db_name": player.get("display_name") or player.get("name") or player.get("common_name"),
+            "player_api_id": player.get("api_player_id") or player.get("player_api_id"),
+            "winner": mapping[winner]["epl"] if winner is not None else None,
+            "claimants": [{
+                "epl": mapping[e[0]]["epl"],
+                "score": e[2],
+                "assigned_match": assigned[e[0]][5] if e[0] in assigned else None,
+                "assigned_score": assigned[e[0]][2] if e[0] in assigned else None,
+            } for e in claims],
+        })
+    write_json(report_path, report)
+
+    accepted = len({e[0] for e in edges})
+    moved = sum(1 for e in assigned.values() if e[3] > 0)
+    if metrics.active:
+        metrics.active.count("assignment_edges", len(edges))
+        metrics.active.count("assignment_contested", len(report))
+    print(f"Assignment ({mode}): {len(edges)} candidate edge(s) for {accepted} name(s); {len(assigned)} assigned, "
+          f"{moved} to a lower-ranked candidate, {accepted - len(assigned)} left unassigned; "
+          f"{len(report)} contested player(s) written to {report_path}")
+    choices = {}
+    for n, r in enumerate(mapping):
+        e = assigned.get(runner_of[r["epl"]])
+        if e is not None:
+            choices[n] = (e[4], e[5], e[2])
+    return choices
+
+THRESHOLD_SWEEP_PATH = "intermediary_files/threshold_sweep.json"
+
+def load_gold(file_path):
+    """
+    Labelled EPL names from a CSV with an `epl,expected` header; expected is a
+    fantasy display name or player_api_id, left empty when the name must stay unmatched.
+    """
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        return {row["epl"].strip(): (row.get("expected") or "").strip() for row in csv.DictReader(f) if row.get("epl")}
+
+def is_expected(expected, best_name, player):
+    api_id = player.get("api_player_id") or player.get("player_api_id")
+    return expected == str(api_id) or normalize(expected) == normalize(best_name)
+
+def sweep_thresholds(mapping, thresholds, full_fantasy, normalized_maps=None, catalog_index=None, store=None, gold=None,
+                     runner_teams=None, blocked=None):
+    """
+    Evaluate every threshold against one map_players() result, the way
+    fuzzy_stage would export at that threshold, without scoring anything again
+    (beyond one catalog lookup for names whose best match is missing from the
+    normalized maps). Exports are simulated on copies of a dry-run store.
+    Returns one row per threshold: accepted and exported counts, the names
+    that drop out at the next threshold and, with gold, precision and recall.
+    runner_teams picks the fixture's player among same-name candidates, as fuzzy_stage does.
+    blocked (team_block_mapping() records aligned with mapping) replaces a
+    name's record at every threshold its fixture block reaches.
+    """
+    map_display, map_name = normalized_maps or build_normalized_maps(full_fantasy)
+    if store is None:
+        store = MappedPlayerStore(MAPPED_PLAYERS_PATH, dry_run=True)
+    lowest = min(thresholds)
+
+    def choose(r):
+        """
+        (player, score the threshold must not exceed) for a record, or None.
+        """
+        nonlocal catalog_index
+        if r is None or r["best_match"] is None or r["best_score"] < lowest:
+            return None
+        teams = runner_teams.get(r["epl"], ()) if runner_teams else ()
+        candidates = same_name_players(normalize(r["best_match"]), map_display, map_name, teams)
+        if candidates:
+            return pick_player(candidates, teams), r["best_score"]
+        if catalog_index is None:
+            catalog_index = CandidateIndex(catalog_display_names(full_fantasy))
+        fallback = catalog_index.top_k(r["epl"], k=1, min_score=lowest)
+        if fallback:
+            return full_fantasy[fallback[0][0]], min(r["best_score"], fallback[0][1])
+        return None
+
+    blocked = blocked or [None] * len(mapping)
+    choices = [choose(r) for r in mapping]
+    block_choices = [choose(b) for b in blocked]
+
+    rows = []
+    accepted_at = []
+    for t in sorted(thresholds):
+        trial = copy.deepcopy(store)
+        accepted = []
+        exported = 0
+        predicted = {}
+        for r, choice, b, block_choice in zip(mapping, choices, blocked, block_choices):
+            if b is not None and b["best_score"] >= t:
+                r, choice = b, block_choice
+            if r["best_match"] is not None and r["best_score"] >= t:
+                accepted.append(r["epl"])
+            if choice is None or choice[1] < t:
+                continue
+            predicted[r["epl"]] = (r["best_match"], choice[0])
+            if trial.add(prepare_export_player(choice[0])):
+                exported += 1
+        accepted_at.append(accepted)
+        row = {"threshold": t, "accepted": len(accepted), "exported": exported}
+        if gold is not None:
+            tp = fp = fn = 0
+            for name, expected in gold.items():
+                hit = predicted.get(name)
+                correct = hit is not None and bool(expected) and is_expected(expected, *hit)
+                tp += correct
+                fp += hit is not None and not correct
+                fn += bool(expected) and not correct
+            row["precision"] = round(tp / (tp + fp), 4) if tp + fp else None
+            row["recall"] = round(tp / (tp + fn), 4) if tp + fn else None
+        rows.append(row)
+
+    for i, row in enumerate(rows[:-1]):
+        kept = set(accepted_at[i + 1])
+        row["dropped_at_next"] = [e for e in accepted_at[i] if e not in kept]
+    if rows:
+        rows[-1]["dropped_at_next"] = []
+    return rows
+
+def run_sweep(
+    thresholds,
+    epl_leftover_csv="intermediary_files/epl_players_remained_after_second_iter.csv",
+    fantasy_pool_csv="intermediary_files/remaining_fantasy_display_names.csv",
+    full_fantasy_json="input_files/Fantasy_LiveScoring.players.json",
+    gold_path=None,
+    output_path=THRESHOLD_SWEEP_PATH,
+    batch_scoring=False,
+    score_workers=-1,
+    workers=1,
+    runner_events_csv="intermediary_files/epl_runner_events.csv"
+):
+    """
+    Score the stage 3 inputs once and report every threshold of the sweep.
+    Nothing is exported; the report is written to output_path.
+    Runner fixtures from runner_events_csv enable event blocking as in run_stage3.
+    """
+    with metrics.stage("fuzzy.load_inputs"):
+        epl_list = load_csv(epl_leftover_csv)
+        fantasy_pool = load_csv(fantasy_pool_csv)
+        full_fantasy = PlayerTable.from_players(stream_fantasy_players(full_fantasy_json))
+        runner_teams = load_runner_teams(runner_events_csv) if os.path.exists(runner_events_csv) else None
+    with metrics.stage("fuzzy.map_players"):
+        normalized_maps = build_normalized_maps(full_fantasy)
+        index = CandidateIndex(fantasy_pool)
+        if workers > 1:
+            mapping = map_players_parallel(epl_list, fantasy_pool, workers, batch=batch_scoring,
+                                           score_workers=score_workers)
+        else:
+            mapping = map_players(epl_list, fantasy_pool, index=index,
+                                  batch=batch_scoring, workers=score_workers)
+        blocked = None
+        team_blocks = build_team_blocks(fantasy_pool, *normalized_maps) if runner_teams else None
+        if team_blocks:
+            contexts = [runner_teams.get(e, ()) for e in epl_list]
+            blocked = team_block_mapping(epl_list, index, contexts, team_blocks, min(thresholds))
+    with metrics.stage("fuzzy.sweep"):
+        gold = load_gold(gold_path) if gold_path else None
+        rows = sweep_thresholds(mapping, thresholds, full_fantasy, normalized_maps=normalized_maps,
+                                gold=gold, runner_teams=runner_teams, blocked=blocked)
+
+    print(f"{'threshold':>9} {'accepted':>8} {'exported':>8}" + (f" {'precision':>9} {'recall':>7}" if gold else "") + "  dropped at next")
+    for row in rows:
+        line = f"{row['threshold']:>9g} {row['accepted']:>8} {row['exported']:>8}"
+        if gold:
+            line += f" {row['precision'] if row['precision'] is not None else '-':>9} {row['recall'] if row['recall'] is not None else '-':>7}"
+        print(line + f"  {len(row['dropped_at_next'])}")
+    write_json(output_path, {"names": len(mapping), "gold": gold_path, "thresholds": rows})
+    print(f"Sweep report written to {output_path}")
+    return rows
+
+def parse_sweep(x):
+    """
+    "start:stop:step" (inclusive) -> list of thresholds, e.g. "40:90:5".
+    """
+    try:
+        start, stop, step = (float(v) for v in x.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("sweep must look like start:stop:step, e.g. 40:90:5")
+    if step <= 0 or not (0 <= start <= stop <= 100):
+        raise argparse.ArgumentTypeError("sweep needs 0 <= start <= stop <= 100 and a positive step")
+    values = []
+    v = start
+    while v <= stop + 1e-9:
+        values.append(round(v, 6))
+        v += step
+    return values
 
 def parse_threshold(x):
     try:
@@ -285,5 +1265,41 @@ if __name__ == "__main__":
                         help="Acceptance threshold (0-100). Defaults to 70.")
     parser.add_argument("--dry-run", "-n", action="store_true",
                         help="Perform a dry run: do NOT modify output_files/mapped_players.json. Mapping results still written for inspection.")
+    parser.add_argument("--flush-every", type=int, default=None,
+                        help="Write mapped_players.json every N new players instead of once at the end of the stage.")
+    parser.add_argument("--batch-scoring", action="store_true",
+                        help="Score all candidates at once with rapidfuzz.process.cdist and NumPy (same results, needs numpy).")
+    parser.add_argument("--score-threads", type=int, default=-1,
+                        help="Threads used by cdist in --batch-scoring mode. Defaults to -1 (all cores).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Match EPL names in N processes. Output is identical to a serial run. Defaults to 1.")
+    parser.add_argument("--prune", choices=PRUNE_MODES, default=None,
+                        help="Skip the fuzzy score of candidates that can't make the top 5 (exact: same output) "
+                             "or can't reach the threshold either (threshold: same exports, no report for unmatched names).")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="json",
+                        help="ndjson streams the mapping results and mapped players one record per line "
+                             "(.ndjson files next to the JSON ones). Defaults to json.")
+    parser.add_argument("--quiet", "-q", action="store_true",
+                        help="Do not print the per-name candidate dump.")
+    parser.add_argument("--assignment", choices=ASSIGNMENT_MODES, default=None,
+                        help="Assign each fantasy player to at most one EPL name over the top candidates: greedy "
+                             "(best score first) or optimal (best total score per conflict group). "
+                             "Contested players go to " + CONTESTED_MATCHES_PATH + ".")
+    parser.add_argument("--sweep", type=parse_sweep, default=None, metavar="START:STOP:STEP",
+                        help="Score once and report accepted/exported counts for every threshold in the range "
+                             "(inclusive) instead of exporting. The report goes to " + THRESHOLD_SWEEP_PATH + ".")
+    parser.add_argument("--gold", default=None,
+                        help="With --sweep: CSV of labelled names (epl,expected) to report precision and recall.")
+    metrics.add_arguments(parser)
     args = parser.parse_args()
-    run_stage3(threshold=args.threshold, dry_run=args.dry_run)
+    if args.gold and not args.sweep:
+        parser.error("--gold needs --sweep")
+    with metrics.from_args(args):
+        if args.sweep:
+            run_sweep(args.sweep, gold_path=args.gold, batch_scoring=args.batch_scoring,
+                      score_workers=args.score_threads, workers=args.workers)
+        else:
+            run_stage3(threshold=args.threshold, dry_run=args.dry_run, flush_every=args.flush_every,
+                       batch_scoring=args.batch_scoring, score_workers=args.score_threads, workers=args.workers,
+                       prune=args.prune, output_format=args.output_format, quiet=args.quiet,
+                       assignment=args.assignment)
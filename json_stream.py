@@ -0,0 +1,190 @@
+import json
+import re
+
+
+CHUNK_SIZE = 1 << 16
+
+_NON_WS = re.compile(r"\S")
+_STRUCT = re.compile(r'["\[\]{}]')
+_STR_SPECIAL = re.compile(r'["\\]')
+_PRIMITIVE_END = re.compile(r"[\s,\]}]")
+
+class _Reader:
+    """
+    Chunked cursor over a JSON text stream. Values are located by scanning for
+    their end and only the ones that are asked for get decoded, so memory stays
+    bounded by the largest value read plus one chunk.
+    """
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.fp.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def skip_ws(self):
+        if self.pos > self.chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        while True:
+            m = _NON_WS.search(self.buf, self.pos)
+            if m:
+                self.pos = m.start()
+                return
+            self.pos = len(self.buf)
+            if not self._fill():
+                return
+
+    def peek(self):
+        self.skip_ws()
+        return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} at offset {self.pos} of the current chunk")
+        self.pos += 1
+
+    def _string_end(self, i):
+        while True:
+            m = _STR_SPECIAL.search(self.buf, i)
+            if not m:
+                i = len(self.buf)
+                if not self._fill():
+                    raise ValueError("truncated JSON string")
+                continue
+            if m.group() == '"':
+                return m.end()
+            if m.end() >= len(self.buf):
+                i = m.start()
+                if not self._fill():
+                    raise ValueError("truncated JSON string")
+                continue
+            i = m.end() + 1
+
+    def _value_end(self):
+        start = self.pos
+        c = self.buf[start] if start < len(self.buf) else ""
+        if not c:
+            raise ValueError("unexpected end of JSON input")
+        if c == '"':
+            return self._string_end(start + 1)
+        if c in "[{":
+            depth = 0
+            i = start
+            while True:
+                m = _STRUCT.search(self.buf, i)
+                if not m:
+                    i = len(self.buf)
+                    if not self._fill():
+                        raise ValueError("truncated JSON value")
+                    continue
+                ch = m.group()
+                i = m.end()
+                if ch == '"':
+                    i = self._string_end(i)
+                elif ch in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return i
+        while True:
+            m = _PRIMITIVE_END.search(self.buf, start)
+            if m:
+                return m.start()
+            if not self._fill():
+                return len(self.buf)
+
+    def decode_value(self):
+        self.skip_ws()
+        end = self._value_end()
+        value = json.loads(self.buf[self.pos:end])
+        self.pos = end
+        return value
+
+    def skip_value(self):
+        self.skip_ws()
+        self.pos = self._value_end()
+
+    def iter_array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        i = 0
+        while True:
+            yield i
+            i += 1
+            c = self.peek()
+            self.pos += 1
+            if c == "]":
+                return
+            if c != ",":
+                raise ValueError(f"expected ',' or ']' in JSON array, got {c!r}")
+
+    def iter_object(self):
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            yield key
+            c = self.peek()
+            self.pos += 1
+            if c == "}":
+                return
+            if c != ",":
+                raise ValueError(f"expected ',' or '}}' in JSON object, got {c!r}")
+
+def _walk(reader, path):
+    if not path:
+        yield reader.decode_value()
+        return
+    step, rest = path[0], path[1:]
+    c = reader.peek()
+    if isinstance(step, str) and step != "*":
+        if c != "{":
+            reader.skip_value()
+            return
+        for key in reader.iter_object():
+            if key == step:
+                yield from _walk(reader, rest)
+            else:
+                reader.skip_value()
+        return
+    if c != "[":
+        reader.skip_value()
+        return
+    for i in reader.iter_array():
+        if step == "*" or i == step:
+            yield from _walk(reader, rest)
+            if step != "*":
+                return
+        else:
+            reader.skip_value()
+
+def iter_json_items(file_path, path, fields=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream the values found at `path` in a JSON file, one at a time.
+    `path` steps are object keys, array indexes, or "*" for every array element,
+    e.g. ("*",) for the items of a top-level list or (0, "events", "*").
+    With `fields`, dict items are reduced to those keys before being yielded.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        for item in _walk(_Reader(f, chunk_size), tuple(path)):
+            if fields is not None and isinstance(item, dict):
+                item = {k: item[k] for k in fields if k in item}
+            yield item
@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fetch_all_player_names import stream_epl_player_names
+from mapping_service import HOST, PORT
+
+
+async def _request(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def _client(args, names, deadline, latencies, errors):
+    if args.unix_socket:
+        reader, writer = await asyncio.open_unix_connection(args.unix_socket)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    rnd = random.Random()
+    try:
+        while time.perf_counter() < deadline:
+            if args.batch > 1:
+                payload = {"names": rnd.sample(names, min(args.batch, len(names)))}
+            else:
+                payload = {"name": rnd.choice(names)}
+            started = time.perf_counter()
+            status, _ = await _request(reader, writer, args.host, "/map", payload)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+async def run(args):
+    names = [n for n in stream_epl_player_names(args.epl_input) if n]
+    latencies, errors = [], []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(_client(args, names, deadline, latencies, errors) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    if not latencies:
+        print("No requests completed.")
+        return
+    ms = [x * 1000 for x in latencies]
+    print(f"{len(latencies)} requests ({len(latencies) * args.batch} names) in {elapsed:.2f}s "
+          f"with {args.concurrency} connection(s): {len(latencies) / elapsed:.0f} req/s, {len(errors)} error(s)")
+    print(f"latency ms: p50={percentile(ms, 0.5):.3f} p95={percentile(ms, 0.95):.3f} "
+          f"p99={percentile(ms, 0.99):.3f} max={ms[-1]:.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a local mapping_service.py instance.")
+    parser.add_argument("--epl-input", default="input_files/epl_data.json",
+                        help="Feed the runner names are drawn from. Defaults to input_files/epl_data.json.")
+    parser.add_argument("--host", default=HOST, help=f"Defaults to {HOST}.")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Defaults to {PORT}.")
+    parser.add_argument("--unix-socket", default=None, help="Connect to this unix socket instead of TCP.")
+    parser.add_argument("--concurrency", "-c", type=int, default=8, help="Keep-alive connections. Defaults to 8.")
+    parser.add_argument("--duration", "-d", type=float, default=10, help="Seconds to run. Defaults to 10.")
+    parser.add_argument("--batch", "-b", type=int, default=1, help="Names per request. Defaults to 1.")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,151 @@
+import json
+import os
+
+import metrics
+from atomic_write import atomic_write
+from ndjson_writer import NDJSONWriter, read_records
+
+
+MAPPED_PLAYERS_PATH = "output_files/mapped_players.json"
+MAPPED_PLAYERS_NDJSON_PATH = "output_files/mapped_players.ndjson"
+
+def player_oid(exported):
+    pid = exported.get("player_id")
+    if isinstance(pid, dict):
+        return pid.get("$oid") or pid.get("oid") or None
+    return None
+
+class MappedPlayerStore:
+    """
+    In-memory view of output_files/mapped_players.json.
+    The file is read once; duplicate checks go through hash indexes on
+    player_api_id and player_id.$oid instead of scanning the list, and the
+    list is written back atomically on flush() (or every batch_size adds).
+    With dry_run=True the file is never touched.
+    A file_path ending in .ndjson streams the records instead: existing and new
+    records are appended to `<file_path>.part` as they come (flush() pushes the
+    write buffer out) and close() renames it into place. Only the indexes stay
+    in memory. With seed_path, the existing records come from that file (e.g.
+    the JSON just written by the exact stage) and replace whatever file_path held.
+    """
+
+    def __init__(self, file_path=MAPPED_PLAYERS_PATH, dry_run=False, batch_size=None, seed_path=None):
+        self.file_path = file_path
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.ndjson = file_path.endswith(".ndjson")
+        self.players = []
+        self.pending = 0
+        self._api_ids = set()
+        self._oids = set()
+        self._others = set()
+        self._writer = None
+        self._load(seed_path)
+
+    def _load(self, seed_path=None):
+        path = seed_path or self.file_path
+        if not os.path.exists(path):
+            return
+        players = read_records(path)
+        for p in players:
+            self._index(p)
+        self.players = players
+
+    def _index(self, p):
+        if not isinstance(p, dict):
+            return
+        api_id = p.get("player_api_id")
+        if api_id is not None:
+            self._api_ids.add(api_id)
+        db_oid = player_oid(p)
+        if db_oid:
+            self._oids.add(db_oid)
+        elif api_id is None:
+            # Only records without either id are compared whole, so only they are kept as text.
+            self._others.add(json.dumps(p, sort_keys=True, ensure_ascii=False))
+
+    def is_duplicate(self, exported):
+        """
+        Duplicate detection by player_api_id (preferred), else _id.$oid, else exact object.
+        """
+        api_id = exported.get("player_api_id")
+        if api_id is not None:
+            return api_id in self._api_ids
+        db_oid = player_oid(exported)
+        if db_oid:
+            return db_oid in self._oids
+        return json.dumps(exported, sort_keys=True, ensure_ascii=False) in self._others
+
+    def player_keys(self):
+        """
+        alias_cache.player_key of every player held, from the id indexes.
+        """
+        return {f"api:{a}" for a in self._api_ids} | {f"oid:{o}" for o in self._oids}
+
+    def add(self, exported):
+        """
+        Add an exported player unless it is a duplicate. Returns True when added.
+        In dry-run mode the indexes are still updated so later duplicates are
+        reported the same way a live run would see them.
+        """
+        if self.is_duplicate(exported):
+            return False
+        self._index(exported)
+        if self.dry_run:
+            return True
+        if self.ndjson:
+            self._open_writer().write(exported)
+        else:
+            self.players.append(exported)
+        self.pending += 1
+        if self.batch_size and self.pending >= self.batch_size:
+            self.flush()
+        return True
+
+    def _open_writer(self):
+        if self._writer is None:
+            self._writer = NDJSONWriter(self.file_path)
+            for p in self.players:
+                self._writer.write(p)
+            self.players = []
+        return self._writer
+
+    def remove(self, predicate):
+        """
+        Drop every record for which predicate(record) is true. Returns how many went.
+        """
+        if self.ndjson:
+            raise ValueError("records can't be removed from a streamed .ndjson store")
+        kept = [p for p in self.players if not predicate(p)]
+        removed = len(self.players) - len(kept)
+        if removed:
+            self.players = kept
+            self._api_ids, self._oids, self._others = set(), set(), set()
+            for p in kept:
+                self._index(p)
+            if not self.dry_run:
+                self.pending += removed
+        return removed
+
+    def flush(self):
+        if self.dry_run or not self.pending:
+            return
+        if self.ndjson:
+            self._writer.flush()
+            self.pending = 0
+            return
+        atomic_write(self.file_path, json.dumps(self.players, indent=4, ensure_ascii=False))
+        if metrics.active:
+            metrics.active.count("mapped_players_writes")
+        self.pending = 0
+
+    def close(self):
+        """
+        Final flush. For an .ndjson store this is when the file is put in place.
+        """
+        if self.ndjson:
+            if self._writer is not None or not self.dry_run:
+                self._open_writer().close()
+            self.pending = 0
+            return
+        self.flush()
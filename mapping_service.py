@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import json
+import time
+
+import catalog as catalog_cache
+import exact_match_mapper as exact
+import fuzzy_matcher as fuzzy
+
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BODY = 1 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+class MappingIndex:
+    """
+    Everything a runtime lookup needs, built once from the compiled catalog:
+    the exact-match index and the fuzzy CandidateIndex over the catalog display names.
+    """
+
+    def __init__(self, fantasy_input, cache_dir=catalog_cache.CACHE_DIR, threshold=70):
+        started = time.perf_counter()
+        self.catalog = catalog_cache.load_compiled_catalog(fantasy_input, cache_dir=cache_dir)
+        self.exact_index, _ = self.catalog.exact_index()
+        self.fuzzy_index = self.catalog.catalog_index()
+        self.threshold = threshold
+        self.loaded_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+
+    def map_name(self, runner_name):
+        """
+        prepare_export_player record (plus match_score 0-1 and match_type "runtime")
+        for one runner name, or None when nothing reaches the threshold.
+        """
+        if not isinstance(runner_name, str) or not runner_name.strip():
+            return None
+        name = runner_name.strip()
+        entry = self.exact_index.get(exact.normalize_name(name))
+        if entry is not None:
+            record = exact.prepare_export_player(entry[1][0])
+            score = 1
+        else:
+            top = self.fuzzy_index.top_k(name, k=1, min_score=self.threshold)
+            if not top:
+                return None
+            record = fuzzy.prepare_export_player(self.catalog.players[top[0][0]])
+            score = round(top[0][1] / 100, 4)
+        return {**record, "match_score": score, "match_type": "runtime"}
+
+class MappingService:
+    """
+    asyncio HTTP/1.1 front end over a MappingIndex.
+    POST /map     {"name": "..."} -> record or null; {"names": [...]} -> list of them
+    POST /reload  rebuild the index in a worker thread and swap it in; requests
+                  keep being served from the old index until the swap
+    GET  /health  catalog size and index age
+    """
+
+    def __init__(self, fantasy_input, cache_dir=catalog_cache.CACHE_DIR, threshold=70):
+        self.fantasy_input = fantasy_input
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self.index = MappingIndex(fantasy_input, cache_dir=cache_dir, threshold=threshold)
+        self._reload_lock = asyncio.Lock()
+
+    async def reload(self):
+        async with self._reload_lock:
+            loop = asyncio.get_running_loop()
+            index = await loop.run_in_executor(
+                None, lambda: MappingIndex(self.fantasy_input, cache_dir=self.cache_dir, threshold=self.threshold)
+            )
+            self.index = index
+        return {"players": len(index.catalog.players), "build_seconds": round(index.build_seconds, 3)}
+
+    def health(self):
+        index = self.index
+        return {"players": len(index.catalog.players), "threshold": index.threshold,
+                "index_age_seconds": round(time.time() - index.loaded_at, 1)}
+
+    async def dispatch(self, method, path, body):
+        if path == "/map":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                # JSONDecodeError, or UnicodeDecodeError for a body that isn't UTF-8.
+                return 400, {"error": "body is not valid JSON"}
+            index = self.index
+            if isinstance(payload, dict) and isinstance(payload.get("names"), list):
+                return 200, [index.map_name(n) for n in payload["names"]]
+            if isinstance(payload, dict) and "name" in payload:
+                return 200, index.map_name(payload["name"])
+            return 400, {"error": 'expected {"name": ...} or {"names": [...]}'}
+        if path == "/reload":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            return 200, await self.reload()
+        if path == "/health":
+            return 200, self.health()
+        return 404, {"error": f"no route for {path}"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except ValueError:
+                    # StreamReader.readline reports a line past the stream limit this way.
+                    await self._respond(writer, 400, {"error": "request line too long"}, close=True)
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "malformed request line"}, close=True)
+                    break
+                headers = {}
+                try:
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        key, _, value = line.decode("latin-1").partition(":")
+                        headers[key.strip().lower()] = value.strip()
+                except ValueError:
+                    await self._respond(writer, 431, {"error": "header line too long"}, close=True)
+                    break
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "invalid Content-Length"}, close=True)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "request body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                close = headers.get("connection", "").lower() == "close"
+                try:
+                    status, payload = await self.dispatch(method, path.split("?", 1)[0], body)
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                await self._respond(writer, status, payload, close=close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, close=False):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+async def serve(service, host=HOST, port=PORT, unix_socket=None):
+    if unix_socket:
+        server = await asyncio.start_unix_server(service.handle, path=unix_socket)
+        where = unix_socket
+    else:
+        server = await asyncio.start_server(service.handle, host=host, port=port)
+        where = f"http://{host}:{port}"
+    print(f"Mapping service on {where} ({len(service.index.catalog.players)} players, "
+          f"index built in {service.index.build_seconds:.3f}s)")
+    async with server:
+        await server.serve_forever()
+
+async def _main(args):
+    service = MappingService(args.fantasy_input, cache_dir=args.cache_dir, threshold=args.threshold)
+    await serve(service, host=args.host, port=args.port, unix_socket=args.unix_socket)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local runner-name mapping service with a warm index.")
+    parser.add_argument("--fantasy-input", default="input_files/Fantasy_LiveScoring.players.json",
+                        help="Fantasy catalog. Defaults to input_files/Fantasy_LiveScoring.players.json.")
+    parser.add_argument("--threshold", "-t", type=fuzzy.parse_threshold, default=70,
+                        help="Fuzzy acceptance threshold (0-100). Defaults to 70.")
+    parser.add_argument("--host", default=HOST, help=f"Defaults to {HOST}.")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Defaults to {PORT}.")
+    parser.add_argument("--unix-socket", default=None, help="Listen on this unix socket instead of TCP.")
+    parser.add_argument("--cache-dir", default=catalog_cache.CACHE_DIR,
+                        help=f"Directory of the compiled catalog cache. Defaults to {catalog_cache.CACHE_DIR}.")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
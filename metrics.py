@@ -0,0 +1,175 @@
+import contextlib
+import cProfile
+import heapq
+import json
+import os
+import time
+import tracemalloc
+
+
+# The Metrics instance collecting data, or None when instrumentation is off.
+# Hot paths test `metrics.active` before doing any work, so a disabled run
+# only pays for one attribute lookup per instrumented call.
+active = None
+
+_NULL_STAGE = contextlib.nullcontext()
+
+class Metrics:
+    """
+    Per-run instrumentation: wall/CPU time (and optionally tracemalloc peak)
+    per stage, named counters, value observations (count/total/max) and the
+    slowest-N EPL queries.
+    """
+
+    def __init__(self, slowest_n=10, trace_memory=False):
+        self.slowest_n = slowest_n
+        self.trace_memory = trace_memory
+        self.counters = {}
+        self.observations = {}
+        self.stages = {}
+        self._slowest = []
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        obs = self.observations.get(name)
+        if obs is None:
+            self.observations[name] = [1, value, value]
+        else:
+            obs[0] += 1
+            obs[1] += value
+            if value > obs[2]:
+                obs[2] = value
+
+    def record_query(self, name, seconds, candidates):
+        entry = (seconds, name, candidates)
+        if len(self._slowest) < self.slowest_n:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+            stage["calls"] += 1
+            stage["wall_seconds"] += time.perf_counter() - wall
+            stage["cpu_seconds"] += time.process_time() - cpu
+            if self.trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+                stage["peak_mb"] = max(stage.get("peak_mb", 0.0), round(peak_mb, 3))
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def merge(self, data):
+        """
+        Fold in the to_dict() of another Metrics (e.g. from a worker process).
+        """
+        for name, n in data["counters"].items():
+            self.count(name, n)
+        for name, obs in data["observations"].items():
+            mine = self.observations.get(name)
+            if mine is None:
+                self.observations[name] = [obs["count"], obs["total"], obs["max"]]
+            else:
+                mine[0] += obs["count"]
+                mine[1] += obs["total"]
+                mine[2] = max(mine[2], obs["max"])
+        for q in data["slowest_queries"]:
+            self.record_query(q["name"], q["seconds"], q["candidates"])
+
+    def to_dict(self):
+        return {
+            "stages": {
+                name: {**s, "wall_seconds": round(s["wall_seconds"], 6), "cpu_seconds": round(s["cpu_seconds"], 6)}
+                for name, s in self.stages.items()
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "observations": {
+                name: {"count": c, "total": t, "max": m, "mean": round(t / c, 3) if c else 0}
+                for name, (c, t, m) in sorted(self.observations.items())
+            },
+            "slowest_queries": [
+                {"name": name, "seconds": round(seconds, 6), "candidates": candidates}
+                for seconds, name, candidates in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+    def write_json(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+
+def enable(slowest_n=10, trace_memory=False):
+    global active
+    active = Metrics(slowest_n=slowest_n, trace_memory=trace_memory)
+    return active
+
+def disable():
+    global active
+    active = None
+
+def stage(name):
+    """
+    Time a block as a named stage; a shared no-op context when metrics are off.
+    """
+    if active is None:
+        return _NULL_STAGE
+    return active.stage(name)
+
+@contextlib.contextmanager
+def profiled(path):
+    """
+    Run the block under cProfile and dump the stats to `path` (no-op when path is falsy).
+    """
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(path)
+
+def add_arguments(parser):
+    parser.add_argument("--metrics-json", default=None,
+                        help="Write per-stage timings, hot-path counters and the slowest queries to this JSON file.")
+    parser.add_argument("--slowest", type=int, default=10,
+                        help="How many of the slowest EPL queries --metrics-json keeps. Defaults to 10.")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Add a tracemalloc peak per stage to --metrics-json (slower).")
+    parser.add_argument("--profile", default=None,
+                        help="Run under cProfile and dump the stats to this file.")
+
+@contextlib.contextmanager
+def from_args(args):
+    """
+    Enable metrics / profiling as requested by add_arguments() options for the block.
+    """
+    if args.metrics_json:
+        enable(slowest_n=args.slowest, trace_memory=args.trace_memory)
+    try:
+        with profiled(args.profile):
+            yield
+    finally:
+        if active is not None:
+            active.write_json(args.metrics_json)
+            disable()
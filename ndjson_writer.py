@@ -0,0 +1,69 @@
+import json
+import os
+
+
+WRITE_BUFFER = 1 << 20
+
+class NDJSONWriter:
+    """
+    Newline-delimited JSON output written while results are produced.
+    Records go through a large write buffer into `<path>.part`, which a
+    consumer can tail; close() flushes it and renames it over `path`
+    atomically, abort() throws it away.
+    """
+
+    def __init__(self, path, buffering=WRITE_BUFFER):
+        self.path = path
+        self.part_path = f"{path}.part"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._f = open(self.part_path, "w", encoding="utf-8", buffering=buffering)
+        self.count = 0
+
+    def write(self, record):
+        self._f.write(json.dumps(record, ensure_ascii=False))
+        self._f.write("\n")
+        self.count += 1
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.close()
+        os.replace(self.part_path, self.path)
+
+    def abort(self):
+        if self._f.closed:
+            return
+        self._f.close()
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def read_records(file_path):
+    """
+    Records of a JSON file (a list, or a single object) or of an NDJSON file.
+    Unreadable content gives an empty list, as an empty mapped_players.json does.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, list) else [data]
+    except json.JSONDecodeError:
+        pass
+    try:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    except json.JSONDecodeError:
+        return []
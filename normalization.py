@@ -0,0 +1,108 @@
+import functools
+import re
+import string
+import unicodedata
+
+
+TRANSLIT_MAP = {
+    "ı": "i",  # dotless i
+    "İ": "I",  # capital dotted i
+    "ğ": "g",
+    "Ğ": "G",
+    "Ø": "O",
+    "ø": "o",
+}
+
+# Distinct names normalized per profile before the least recently used ones are evicted.
+MEMO_SIZE = 1 << 16
+
+_JR = re.compile(r"\b(jr|junior)\b")
+_FUZZY_KEEP = set(string.ascii_lowercase + string.digits + "'")
+
+def _fold_char(c):
+    """
+    NFKD decomposition of one character with the combining marks dropped.
+    Folding a string character by character gives the same result as folding
+    it whole, since canonical reordering only moves combining marks.
+    """
+    return "".join(x for x in unicodedata.normalize("NFKD", c) if not unicodedata.combining(x))
+
+def _fuzzy_char(c):
+    if c in "-–":
+        return " "
+    if c == "’":
+        return "'"
+    return c if c in _FUZZY_KEEP or c.isspace() else " "
+
+class _CharTable(dict):
+    """
+    str.translate table filled in lazily: the first time a code point is seen
+    its replacement is computed by fn and kept for every later call.
+    """
+
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+
+    def __missing__(self, code):
+        value = self.fn(chr(code))
+        self[code] = value
+        return value
+
+ACCENTS_TABLE = _CharTable(_fold_char)
+DISPLAY_TABLE = _CharTable(lambda c: "".join(TRANSLIT_MAP.get(x, x) for x in _fold_char(c)))
+FUZZY_TABLE = _CharTable(lambda c: "".join(_fuzzy_char(x) for x in _fold_char(c)))
+_FUZZY_ASCII = bytes(ord(_fuzzy_char(chr(i))) if i < 128 else i for i in range(256))
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def strip_accents(text):
+    """
+    NFKD decomposition without combining marks ("Håland" -> "Haland").
+    """
+    return text if text.isascii() else text.translate(ACCENTS_TABLE)
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def display_form(text):
+    """
+    strip_accents plus TRANSLIT_MAP, case kept ("Çağlar Söyüncü" -> "Caglar Soyuncu").
+    """
+    return text if text.isascii() else text.translate(DISPLAY_TABLE)
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def exact_form(text):
+    """
+    display_form lower-cased and stripped: the exact-match key.
+    """
+    return display_form(text).lower().strip()
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def fuzzy_form(text):
+    """
+    Lower-cased, accent-folded, punctuation turned into spaces, "jr"/"junior"
+    dropped and whitespace collapsed: the fuzzy matcher's form. TRANSLIT_MAP
+    is not applied, so e.g. "ø" becomes a space.
+    """
+    s = text.lower().strip()
+    if s.isascii():
+        s = s.encode("ascii").translate(_FUZZY_ASCII).decode("ascii")
+    else:
+        s = s.translate(FUZZY_TABLE)
+    if "jr" in s or "junior" in s:
+        s = _JR.sub("", s)
+    return " ".join(s.split())
+
+# The normalization each stage has always used, by name. None inputs give
+# None for "accents" / "display" and "" for "exact" / "fuzzy".
+PROFILES = {
+    "accents": strip_accents,
+    "display": display_form,
+    "exact": exact_form,
+    "fuzzy": fuzzy_form,
+}
+
+_NONE_RESULT = {"accents": None, "display": None, "exact": "", "fuzzy": ""}
+
+def normalize(text, profile):
+    if text is None:
+        return _NONE_RESULT[profile]
+    return PROFILES[profile](text)
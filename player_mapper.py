@@ -0,0 +1,417 @@
+import argparse
+import concurrent.futures
+import functools
+import glob
+import json
+import os
+
+import catalog as catalog_cache
+from alias_cache import ALIAS_TTL_DAYS, AliasCache, exported_key, player_key
+from atomic_write import atomic_write
+from run_state import RunState, catalog_fingerprints
+import fetch_all_player_names as extraction
+import exact_match_mapper as exact
+import fuzzy_matcher as fuzzy
+import metrics
+from mapped_players_store import MAPPED_PLAYERS_NDJSON_PATH, MAPPED_PLAYERS_PATH, MappedPlayerStore
+
+
+EPL_INPUT = "input_files/epl_data.json"
+FANTASY_INPUT = "input_files/Fantasy_LiveScoring.players.json"
+BATCH_REPORT_PATH = "output_files/batch_report.json"
+
+def csv_names(names, drop_empty=False):
+    """
+    Same values the stages used to read back from the intermediary CSVs
+    (None skipped, surrounding whitespace stripped).
+    """
+    stripped = [n.strip() for n in names if n is not None]
+    return [n for n in stripped if n] if drop_empty else stripped
+
+def resolution(match_type, match_score, players):
+    return {
+        "match_type": match_type,
+        "match_score": match_score,
+        "player_api_ids": [p.get("api_player_id") or p.get("player_api_id") for p in players],
+    }
+
+def run_pipeline(
+    epl_input=EPL_INPUT,
+    fantasy_input=FANTASY_INPUT,
+    threshold=70,
+    dry_run=False,
+    debug_artifacts=False,
+    flush_every=None,
+    batch_scoring=False,
+    score_workers=-1,
+    workers=1,
+    prune=None,
+    use_cache=True,
+    cache_dir=catalog_cache.CACHE_DIR,
+    use_aliases=False,
+    alias_ttl_days=ALIAS_TTL_DAYS,
+    incremental=False,
+    output_format="json",
+    quiet=False,
+    epl_runners=None,
+    resolutions=None,
+    assignment=None
+):
+    """
+    Extraction, exact mapping and fuzzy matching in one process: every input is
+    loaded once and names are handed between stages in memory. The intermediary
+    CSVs are only written when debug_artifacts is set; outputs are the same as
+    the three-script run_all.sh pipeline.
+    The fantasy catalog comes from the compiled catalog cache when it is warm.
+    With use_aliases, runner names resolved by earlier runs (and whose players
+    are unchanged in the catalog) are exported straight from the alias cache
+    and skip matching. An exact alias is checked against the current exact
+    index, so only its order in mapped_players.json and its absence from the
+    results differ from a full run. A fuzzy alias replays an earlier run's
+    choice: it is dropped when the catalog file changes, but a fresh run over a
+    different fuzzy pool (other runners in the feed) could choose differently.
+    With incremental, mapped_players.json is kept and only runner names that
+    are new, or whose outcome the catalog changes since the last incremental
+    run may affect, are matched; records of removed or changed catalog
+    players are dropped first. The first incremental run is a full one.
+    output_format="ndjson" streams mapped players and fuzzy results as .ndjson
+    files (not combinable with incremental); quiet skips the per-name dump.
+    assignment ("greedy" / "optimal") makes the fuzzy stage assign each
+    fantasy player to at most one runner name (fuzzy_matcher.assign_matches).
+    epl_runners replaces the feed read from epl_input (see run_batch), and
+    resolutions, when given, is filled with runnerName -> {"match_type",
+    "match_score", "player_api_ids"} for every name that was mapped.
+    """
+    if incremental and output_format == "ndjson":
+        raise ValueError("--incremental needs the json output format")
+    mapped_path = MAPPED_PLAYERS_NDJSON_PATH if output_format == "ndjson" else MAPPED_PLAYERS_PATH
+    print("Loading JSON inputs...")
+    with metrics.stage("load_inputs"):
+        catalog = catalog_cache.load_compiled_catalog(fantasy_input, cache_dir=cache_dir, use_cache=use_cache)
+        fantasy_json = catalog.players
+        if epl_runners is None:
+            epl_runners = extraction.stream_epl_runners(epl_input)
+        epl_names = [r["runner"] for r in epl_runners]
+
+    if debug_artifacts:
+        extraction.export_csv(epl_names, "intermediary_files/epl_player_names.csv")
+        extraction.export_runner_events(epl_runners, "intermediary_files/epl_runner_events.csv")
+        extraction.export_csv(extraction.get_fantasy_player_display_names(fantasy_json),
+                              "intermediary_files/fantasy_player_display_names.csv")
+        extraction.export_csv(extraction.get_fantasy_player_names(fantasy_json),
+                              "intermediary_files/fantasy_player_names.csv")
+
+    def artifact(path):
+        return path if debug_artifacts else None
+
+    runner_names = csv_names(epl_names)
+    held_out = []
+    state = None
+    if incremental:
+        with metrics.stage("incremental.plan"):
+            state = RunState(os.path.join(cache_dir, "run_state.json"),
+                             version=catalog_cache.normalization_version(), threshold=threshold)
+            fingerprints = catalog_fingerprints(fantasy_json)
+            todo, stale = state.plan(runner_names, fingerprints)
+            todo_set = set(todo)
+            held_out = [n for n in runner_names if n not in todo_set]
+            runner_names = todo
+        print(f"Incremental run: {len(runner_names)} runner name(s) to match, {len(held_out)} unchanged, "
+              f"{len(stale)} catalog record(s) removed or changed.")
+
+    if not state or not state.loaded:
+        try:
+            os.remove(mapped_path)
+        except FileNotFoundError:
+            pass
+
+    store = MappedPlayerStore(mapped_path, batch_size=flush_every)
+    if state and state.loaded and stale:
+        store.remove(lambda p: exported_key(p) in stale)
+    exact_index = catalog.exact_index()
+    aliases = None
+    alias_hits = {}
+    if use_aliases:
+        with metrics.stage("aliases"):
+            aliases = AliasCache(os.path.join(cache_dir, "aliases.json"),
+                                 version=catalog_cache.normalization_version(), ttl_days=alias_ttl_days,
+                                 catalog=catalog_cache.file_sha256(fantasy_input))
+            players_by_key = {}
+            for p in fantasy_json:
+                players_by_key.setdefault(player_key(p), p)
+            for name in runner_names:
+                hit = aliases.resolve(name, players_by_key, threshold=threshold, exact_index=exact_index[0])
+                if hit is not None:
+                    alias_hits[name] = hit
+            runner_names = [n for n in runner_names if n not in alias_hits]
+        print(f"Resolved {len(alias_hits)} runner name(s) from the alias cache.")
+
+    exact_resolved = {}
+    with metrics.stage("exact"):
+        for players, entry in alias_hits.values():
+            if entry["match_type"] == "exact":
+                for p in players:
+                    exact.export_individual_player(p, store=store)
+        not_found, remaining_display = exact.map_exact(
+            runner_names,
+            fantasy_json,
+            file_name_not_found=artifact("intermediary_files/epl_players_remained_after_second_iter.csv"),
+            output_file_name_remaining=None if alias_hits or held_out else artifact("intermediary_files/remaining_fantasy_display_names.csv"),
+            store=store,
+            index=exact_index,
+            resolved=exact_resolved
+        )
+        if alias_hits or held_out:
+            # Names that skip matching still take their normalized form out of the fuzzy pool.
+            skipped_norms = {entry["norm"] for _, entry in alias_hits.values()}
+            skipped_norms.update(exact.normalize_name(n) for n in held_out)
+            remaining_display = [n for n in remaining_display if n not in skipped_norms]
+            if debug_artifacts:
+                exact.write_lines(remaining_display, "intermediary_files/remaining_fantasy_display_names.csv")
+        store.flush()
+
+    # The exact stage always writes; stage 3 honours --dry-run on the same
+    # in-memory store, so it still sees every player exported above.
+    store.dry_run = dry_run
+    for players, entry in alias_hits.values():
+        if entry["match_type"] == "fuzzy":
+            fuzzy.export_individual_player(players[0], store=store)
+    fuzzy_resolved = {}
+    mapping = fuzzy.fuzzy_stage(
+        csv_names(not_found, drop_empty=True),
+        csv_names(remaining_display, drop_empty=True),
+        fantasy_json,
+        threshold=threshold,
+        dry_run=dry_run,
+        batch_scoring=batch_scoring,
+        score_workers=score_workers,
+        store=store,
+        results_path=fuzzy.FUZZY_RESULTS_NDJSON_PATH if output_format == "ndjson" else fuzzy.FUZZY_RESULTS_PATH,
+        remaining_path=artifact(fuzzy.REMAINING_AFTER_FUZZY_PATH),
+        normalized_maps=catalog.normalized_maps(),
+        catalog_index=catalog.catalog_index(),
+        workers=workers,
+        prune=prune,
+        resolved=fuzzy_resolved,
+        quiet=quiet,
+        runner_teams=extraction.runner_teams(epl_runners),
+        assignment=assignment
+    )
+    store.close()
+
+    if resolutions is not None:
+        for name, (players, entry) in alias_hits.items():
+            resolutions[name] = resolution(entry["match_type"], entry["match_score"], players)
+        for name, (_, players) in exact_resolved.items():
+            resolutions[name] = resolution("exact", 100.0, players)
+        for name, (player, score) in fuzzy_resolved.items():
+            resolutions[name] = resolution("fuzzy", score, [player])
+    if aliases is not None and not dry_run:
+        for name, (norm, players) in exact_resolved.items():
+            aliases.record(name, norm, players, "exact", 100.0)
+        for name, (player, score) in fuzzy_resolved.items():
+            aliases.record(name, exact.normalize_name(name), [player], "fuzzy", score)
+        aliases.save()
+    if state is not None and not dry_run:
+        resolved_keys = {name: [player_key(p) for p in players] for name, (players, _) in alias_hits.items()}
+        resolved_keys.update((name, [player_key(p) for p in players]) for name, (_, players) in exact_resolved.items())
+        resolved_keys.update((name, [player_key(player)]) for name, (player, _) in fuzzy_resolved.items())
+        state.update(runner_names + list(alias_hits), resolved_keys, fingerprints)
+        state.save()
+    return mapping
+
+def feed_paths(patterns):
+    """
+    Feed files named by directories (their *.json files) and glob patterns, in order, each once.
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.json")))
+        else:
+            matches = sorted(glob.glob(pattern))
+        paths.extend(p for p in matches if p not in paths)
+    return paths
+
+def parse_feeds(paths, market_types, workers=None):
+    """
+    feed path -> (runners, error) with every feed parsed in its own process.
+    A feed that can't be read or parsed gets its error instead of failing the batch.
+    """
+    parse = functools.partial(extraction.stream_epl_runners, market_types=tuple(market_types), all_sections=True)
+    parsed = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {path: executor.submit(parse, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                parsed[path] = (future.result(), None)
+            except (OSError, ValueError) as e:
+                parsed[path] = ([], str(e))
+    return parsed
+
+def merge_runners(runner_lists):
+    """
+    One runner per stripped name across every feed, carrying the teams of every
+    fixture it was offered in, so each name is matched once.
+    """
+    merged = {}
+    for runners in runner_lists:
+        for r in runners:
+            if r["runner"] is None or not r["runner"].strip():
+                continue
+            name = r["runner"].strip()
+            runner = merged.setdefault(name, {"runner": name, "event": r["event"], "teams": ()})
+            runner["teams"] += tuple(t for t in r["teams"] if t not in runner["teams"])
+    return list(merged.values())
+
+def feed_report(path, runners, error, resolutions):
+    names = list(dict.fromkeys(csv_names((r["runner"] for r in runners), drop_empty=True)))
+    matches = {name: resolutions.get(name) for name in names}
+    return {
+        "feed": path,
+        "error": error,
+        "runners": len(runners),
+        "unique_names": len(names),
+        "exact": sum(1 for m in matches.values() if m and m["match_type"] == "exact"),
+        "fuzzy": sum(1 for m in matches.values() if m and m["match_type"] == "fuzzy"),
+        "unmatched": [name for name, m in matches.items() if m is None],
+        "matches": {name: m for name, m in matches.items() if m is not None},
+    }
+
+def run_batch(feeds, market_types=(extraction.MARKET_TYPE,), parse_workers=None, report_path=BATCH_REPORT_PATH,
+              **pipeline_options):
+    """
+    Map many feeds against one catalog in a single pipeline run. Feeds (a list of
+    directories / glob patterns) are parsed concurrently for the given market
+    types across all their sections, runner names are deduplicated across
+    feeds and matched once, and report_path gets one entry per feed with the
+    exact / fuzzy / unmatched outcome of each of its names. mapped_players.json
+    and the fuzzy results cover the union of the feeds.
+    """
+    paths = feed_paths(feeds)
+    if not paths:
+        raise ValueError(f"no feed files match {feeds}")
+    print(f"Parsing {len(paths)} feed(s) for market type(s) {', '.join(market_types)}...")
+    with metrics.stage("parse_feeds"):
+        parsed = parse_feeds(paths, market_types, workers=parse_workers)
+        runners = merge_runners(r for r, _ in parsed.values())
+    total = sum(len(r) for r, _ in parsed.values())
+    print(f"{total} runner(s) across feeds, {len(runners)} unique name(s) to match.")
+    if metrics.active:
+        metrics.active.count("batch_feeds", len(paths))
+        metrics.active.count("batch_runners", total)
+        metrics.active.count("batch_unique_names", len(runners))
+
+    resolutions = {}
+    run_pipeline(epl_runners=runners, resolutions=resolutions, **pipeline_options)
+
+    report = [feed_report(path, r, error, resolutions) for path, (r, error) in parsed.items()]
+    atomic_write(report_path, json.dumps(report, indent=4, ensure_ascii=False))
+    for entry in report:
+        status = f"error: {entry['error']}" if entry["error"] else (
+            f"{entry['exact']} exact, {entry['fuzzy']} fuzzy, {len(entry['unmatched'])} unmatched")
+        print(f"  {entry['feed']}: {entry['unique_names']} name(s), {status}")
+    print(f"Batch report written to {report_path}")
+    return report
+
+def parse_market_types(value):
+    types = tuple(t.strip() for t in value.split(",") if t.strip())
+    if not types:
+        raise argparse.ArgumentTypeError("expected at least one market type")
+    return types
+
+def add_pipeline_arguments(parser):
+    parser.add_argument("--fantasy-input", default=FANTASY_INPUT, help=f"Fantasy catalog. Defaults to {FANTASY_INPUT}.")
+    parser.add_argument("--threshold", "-t", type=fuzzy.parse_threshold, default=70,
+                        help="Fuzzy acceptance threshold (0-100). Defaults to 70.")
+    parser.add_argument("--dry-run", "-n", action="store_true",
+                        help="Do NOT let the fuzzy stage modify output_files/mapped_players.json.")
+    parser.add_argument("--debug-artifacts", action="store_true",
+                        help="Also write the intermediary CSVs of the three-script pipeline.")
+    parser.add_argument("--flush-every", type=int, default=None,
+                        help="Write mapped_players.json every N new players instead of once per stage.")
+    parser.add_argument("--batch-scoring", action="store_true",
+                        help="Score fuzzy candidates with rapidfuzz.process.cdist and NumPy.")
+    parser.add_argument("--score-threads", type=int, default=-1,
+                        help="Threads used by cdist in --batch-scoring mode. Defaults to -1 (all cores).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Fuzzy-match EPL names in N processes. Defaults to 1.")
+    parser.add_argument("--prune", choices=fuzzy.PRUNE_MODES, default=None,
+                        help="Skip fuzzy scores that can't make the top 5 (exact) or reach the threshold (threshold).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the compiled catalog cache.")
+    parser.add_argument("--cache-dir", default=catalog_cache.CACHE_DIR,
+                        help=f"Directory of the compiled catalog cache. Defaults to {catalog_cache.CACHE_DIR}.")
+    parser.add_argument("--aliases", action="store_true",
+                        help="Reuse runner names resolved by earlier runs (cache_files/aliases.json) and record new ones.")
+    parser.add_argument("--alias-ttl-days", type=float, default=ALIAS_TTL_DAYS,
+                        help=f"Forget aliases unused for this many days. Defaults to {ALIAS_TTL_DAYS}.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Keep mapped_players.json and only match runner names that are new or affected by "
+                             "catalog changes since the last --incremental run (cache_files/run_state.json).")
+    parser.add_argument("--output-format", choices=fuzzy.OUTPUT_FORMATS, default="json",
+                        help="ndjson streams mapped players and fuzzy results one record per line. Defaults to json.")
+    parser.add_argument("--quiet", "-q", action="store_true",
+                        help="Do not print the per-name candidate dump.")
+    parser.add_argument("--assignment", choices=fuzzy.ASSIGNMENT_MODES, default=None,
+                        help="Assign each fantasy player to at most one runner name, greedy or optimal per "
+                             "conflict group; contested players go to " + fuzzy.CONTESTED_MATCHES_PATH + ".")
+    metrics.add_arguments(parser)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m player_mapper",
+                                     description="Player-mapper pipeline runner.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run extraction, exact mapping and fuzzy matching in one process.")
+    run.add_argument("--epl-input", default=EPL_INPUT, help=f"EPL betting feed. Defaults to {EPL_INPUT}.")
+    add_pipeline_arguments(run)
+
+    batch = sub.add_parser("batch", help="Map many feeds in one run, matching each distinct runner name once.")
+    batch.add_argument("feeds", nargs="+", help="Feed directories (all their *.json files) or glob patterns.")
+    batch.add_argument("--market-types", type=parse_market_types, default=(extraction.MARKET_TYPE,),
+                       help=f"Comma-separated market types to read runners from. Defaults to {extraction.MARKET_TYPE}.")
+    batch.add_argument("--parse-workers", type=int, default=None,
+                       help="Processes parsing feeds concurrently. Defaults to one per core.")
+    batch.add_argument("--report", default=BATCH_REPORT_PATH,
+                       help=f"Per-feed result report. Defaults to {BATCH_REPORT_PATH}.")
+    add_pipeline_arguments(batch)
+    return parser
+
+def pipeline_options(args):
+    return dict(
+        fantasy_input=args.fantasy_input,
+        threshold=args.threshold,
+        dry_run=args.dry_run,
+        debug_artifacts=args.debug_artifacts,
+        flush_every=args.flush_every,
+        batch_scoring=args.batch_scoring,
+        score_workers=args.score_threads,
+        workers=args.workers,
+        prune=args.prune,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        use_aliases=args.aliases,
+        alias_ttl_days=args.alias_ttl_days,
+        incremental=args.incremental,
+        output_format=args.output_format,
+        quiet=args.quiet,
+        assignment=args.assignment
+    )
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "batch" and not feed_paths(args.feeds):
+        parser.error(f"no feed files match {' '.join(args.feeds)}")
+    if args.incremental and args.output_format == "ndjson":
+        parser.error("--incremental needs --output-format json")
+    with metrics.from_args(args):
+        if args.command == "run":
+            run_pipeline(epl_input=args.epl_input, **pipeline_options(args))
+        elif args.command == "batch":
+            run_batch(args.feeds, market_types=args.market_types, parse_workers=args.parse_workers,
+                      report_path=args.report, **pipeline_options(args))
+
+if __name__ == "__main__":
+    main()
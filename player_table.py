@@ -0,0 +1,129 @@
+import array
+import collections.abc
+import sys
+
+from fetch_all_player_names import FANTASY_PLAYER_FIELDS
+
+
+def _pack(value):
+    """
+    Compact, marshal-able form of a JSON value: strings interned, objects
+    turned into tuples of (key, value) pairs. JSON never yields tuples, so a
+    tuple always stands for an object.
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, dict):
+        return tuple((sys.intern(k), _pack(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_pack(v) for v in value]
+    return value
+
+def _unpack(value):
+    if isinstance(value, tuple):
+        return {k: _unpack(v) for k, v in value}
+    if isinstance(value, list):
+        return [_unpack(v) for v in value]
+    return value
+
+class PlayerRow(collections.abc.Mapping):
+    """
+    Read-only dict view of one PlayerTable row, usable wherever the stages
+    expect a projected player dict (get, [], items, dict(row), ==).
+    Object values such as _id come back as fresh dicts.
+    """
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, field):
+        return self.table.value(self.row, field)
+
+    def get(self, field, default=None):
+        try:
+            return self.table.value(self.row, field)
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        return iter(self.table.row_fields(self.row))
+
+    def __len__(self):
+        return len(self.table.row_fields(self.row))
+
+    def __eq__(self, other):
+        if isinstance(other, PlayerRow) and other.table is self.table:
+            return other.row == self.row
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"PlayerRow({self.row}, {dict(self)!r})"
+
+class PlayerTable(collections.abc.Sequence):
+    """
+    Columnar fantasy catalog: one list per projected field (FANTASY_PLAYER_FIELDS)
+    holding interned values, plus a bitmask per row of the fields the player
+    actually had, so absent and null fields stay distinct. Players are
+    addressed by integer row id; table[row] is a PlayerRow view and nothing
+    else is kept per player.
+    """
+
+    def __init__(self, fields, columns, masks):
+        self.fields = tuple(fields)
+        self.columns = columns
+        self.masks = masks
+        self._bit = {f: 1 << i for i, f in enumerate(self.fields)}
+
+    @classmethod
+    def from_players(cls, players, fields=FANTASY_PLAYER_FIELDS):
+        fields = tuple(fields)
+        columns = {f: [] for f in fields}
+        masks = array.array("Q")
+        for p in players:
+            mask = 0
+            for i, f in enumerate(fields):
+                if f in p:
+                    mask |= 1 << i
+                    columns[f].append(_pack(p[f]))
+                else:
+                    columns[f].append(None)
+            masks.append(mask)
+        return cls(fields, columns, masks)
+
+    def to_dict(self):
+        return {"fields": list(self.fields), "columns": self.columns, "masks": self.masks.tobytes()}
+
+    @classmethod
+    def from_dict(cls, data):
+        masks = array.array("Q")
+        masks.frombytes(data["masks"])
+        return cls(data["fields"], data["columns"], masks)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [PlayerRow(self, i) for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("player row out of range")
+        return PlayerRow(self, row)
+
+    def value(self, row, field):
+        """
+        Value of field for a row; KeyError when the player has no such field.
+        """
+        bit = self._bit.get(field)
+        if bit is None or not self.masks[row] & bit:
+            raise KeyError(field)
+        return _unpack(self.columns[field][row])
+
+    def row_fields(self, row):
+        mask = self.masks[row]
+        return [f for f in self.fields if mask & self._bit[f]]
@@ -0,0 +1,79 @@
+import json
+
+from alias_cache import player_fingerprint, player_key
+from atomic_write import atomic_write
+
+
+RUN_STATE_PATH = "cache_files/run_state.json"
+
+def catalog_fingerprints(players):
+    """
+    player_key -> record fingerprint for every catalog player that has a key.
+    """
+    fingerprints = {}
+    for p in players:
+        key = player_key(p)
+        if key is not None and key not in fingerprints:
+            fingerprints[key] = player_fingerprint(p)
+    return fingerprints
+
+class RunState:
+    """
+    Manifest of the previous --incremental run: the player keys every runner
+    name resolved to ([] when unmatched) and the fingerprint of every catalog
+    record. A manifest written under another normalization version or
+    threshold is ignored, which makes the next run a full one.
+    """
+
+    def __init__(self, file_path=RUN_STATE_PATH, version=None, threshold=None):
+        self.file_path = file_path
+        self.version = version
+        self.threshold = threshold
+        self.runners = {}
+        self.catalog = {}
+        self.loaded = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict) or data.get("version") != self.version or data.get("threshold") != self.threshold:
+            return
+        self.runners = data.get("runners", {})
+        self.catalog = data.get("catalog", {})
+        self.loaded = True
+
+    def plan(self, runner_names, fingerprints):
+        """
+        Returns (runners to process, stale player keys).
+        Stale keys are catalog records that were removed or changed since the
+        last run. A runner is processed when it is new, when it resolved to a
+        stale record, or when it was unmatched and the catalog gained or
+        changed records.
+        """
+        if not self.loaded:
+            return list(runner_names), set()
+        stale = {k for k, fp in self.catalog.items() if fingerprints.get(k) != fp}
+        catalog_grew = bool(stale) or any(k not in self.catalog for k in fingerprints)
+        todo = []
+        for name in runner_names:
+            keys = self.runners.get(name)
+            if keys is None or (not keys and catalog_grew) or any(k in stale for k in keys):
+                todo.append(name)
+        return todo, stale
+
+    def update(self, processed, resolved_keys, fingerprints):
+        for name in processed:
+            self.runners[name] = resolved_keys.get(name, [])
+        self.catalog = fingerprints
+
+    def save(self):
+        atomic_write(self.file_path, json.dumps({
+            "version": self.version,
+            "threshold": self.threshold,
+            "runners": self.runners,
+            "catalog": self.catalog,
+        }, ensure_ascii=False))